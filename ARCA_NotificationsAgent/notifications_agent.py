@@ -5,7 +5,7 @@ Default: dry-run (no email sent).
 To send real email: add an app password into user_preferences.json and run with --send.
 """
 
-import json
+import sys
 import smtplib
 import argparse
 from pathlib import Path
@@ -17,24 +17,44 @@ from email.mime.application import MIMEApplication
 BASE_DIR = Path(__file__).resolve().parent
 PROJECT_ROOT = BASE_DIR.parent
 
-# Using your real filenames
-RESEARCHER_UPDATES = PROJECT_ROOT / "outputs" / "researcher_output_chroma.json"
-AUDITOR_UPDATES = PROJECT_ROOT / "AuditorAgent" / "outputs" / "auditor_output.json"
-GENERATOR_REPORT = PROJECT_ROOT / "GeneratorAgent" / "outputs" / "final_report.json"
+# Shared code (arca_common) lives at the project root
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+from arca_common.serialization import read_data, write_atomic  # noqa: E402
+from arca_common.tenancy import DEFAULT_TENANT, tenant_paths as _tenant_paths  # noqa: E402
 
-USER_PREFS = BASE_DIR / "user_preferences.json"
 HTML_TEMPLATE = BASE_DIR / "templates" / "email_template.html"
 TXT_TEMPLATE = BASE_DIR / "templates" / "email_template.txt"
-NEWSLETTERS_DIR = BASE_DIR / "outputs" / "newsletters"
-LOGS_DIR = BASE_DIR / "outputs" / "logs"
-STATE_FILE = BASE_DIR / "outputs" / "last_state.json"
+
+def tenant_paths(tenant=DEFAULT_TENANT):
+    """Files read and written for a tenant (default tenant = original layout, see arca_common.tenancy)."""
+    p = _tenant_paths(tenant)
+    return {
+        "researcher": p.researcher_output,
+        "auditor": p.auditor_output,
+        "generator": p.final_report,
+        "prefs": p.user_preferences,
+        "newsletters": p.newsletters_dir,
+        "logs": p.notification_logs_dir,
+        "state": p.notifications_state,
+    }
+
+# Using your real filenames (default tenant)
+_DEFAULT_PATHS = tenant_paths(DEFAULT_TENANT)
+RESEARCHER_UPDATES = _DEFAULT_PATHS["researcher"]
+AUDITOR_UPDATES = _DEFAULT_PATHS["auditor"]
+GENERATOR_REPORT = _DEFAULT_PATHS["generator"]
+USER_PREFS = _DEFAULT_PATHS["prefs"]
+NEWSLETTERS_DIR = _DEFAULT_PATHS["newsletters"]
+LOGS_DIR = _DEFAULT_PATHS["logs"]
+STATE_FILE = _DEFAULT_PATHS["state"]
 
 # --- helpers ---------------------------------------------------------
 def load_json_safe(path: Path):
     if not path.exists():
         return None
     try:
-        return json.loads(path.read_text(encoding="utf-8"))
+        return read_data(path)
     except Exception:
         return None
 
@@ -44,16 +64,16 @@ def _file_digest(path: Path) -> str:
     s = path.stat()
     return f"{int(s.st_mtime)}::{s.st_size}"
 
-def _load_state():
-    if STATE_FILE.exists():
+def _load_state(state_file=STATE_FILE):
+    if state_file.exists():
         try:
-            return json.loads(STATE_FILE.read_text(encoding="utf-8"))
+            return read_data(state_file)
         except Exception:
             return {}
     return {}
 
-def _save_state(state):
-    STATE_FILE.write_text(json.dumps(state, indent=2), encoding="utf-8")
+def _save_state(state, state_file=STATE_FILE):
+    write_atomic(state_file, state)
 
 def build_email_content(updates, recommendation):
     html_template = HTML_TEMPLATE.read_text(encoding="utf-8") if HTML_TEMPLATE.exists() else None
@@ -78,16 +98,17 @@ def build_email_content(updates, recommendation):
 
     return html, text
 
-def detect_updates(prefs, state):
+def detect_updates(prefs, state, paths=None):
+    paths = paths or tenant_paths()
     updates = []
     recommendation = "No new recommendations."
 
     # Researcher: new internal policies
     if prefs.get("subscribe_internal", True):
-        digest = _file_digest(RESEARCHER_UPDATES)
+        digest = _file_digest(paths["researcher"])
         if digest and state.get("researcher_digest") != digest:
             # load top_5_passages summary for a nicer line (if possible)
-            r = load_json_safe(RESEARCHER_UPDATES)
+            r = load_json_safe(paths["researcher"])
             if r and isinstance(r, dict) and r.get("query"):
                 updates.append(f"📘 Internal policy update detected (query: {r.get('query')}).")
             else:
@@ -96,7 +117,7 @@ def detect_updates(prefs, state):
 
     # Generator changes (national/international)
     if prefs.get("subscribe_national", True) or prefs.get("subscribe_international", True):
-        digest = _file_digest(GENERATOR_REPORT)
+        digest = _file_digest(paths["generator"])
         if digest and state.get("generator_digest") != digest:
             if prefs.get("subscribe_national", True):
                 updates.append("🇲🇦 New national regulation or report detected (Generator).")
@@ -106,18 +127,29 @@ def detect_updates(prefs, state):
 
     # Auditor high-risk conflicts and summary counts
     if prefs.get("subscribe_high_risk", True):
-        aud = load_json_safe(AUDITOR_UPDATES)
+        aud = load_json_safe(paths["auditor"])
         if aud:
             items = aud.get("results", aud) if isinstance(aud, dict) else aud
-            # count severities
+            summary = aud.get("severity_summary") if isinstance(aud, dict) else None
+            # the Generator's summary also counts the risks copied to
+            # near-duplicate policies: use it when it is from this audit
+            report = load_json_safe(paths["generator"])
+            if (isinstance(report, dict) and isinstance(report.get("severity_summary"), dict)
+                    and paths["generator"].stat().st_mtime >= paths["auditor"].stat().st_mtime):
+                summary = report["severity_summary"]
+            # count severities (precomputed when available)
             counts = {"HIGH":0, "MEDIUM":0, "LOW":0}
-            try:
-                for i in items:
-                    sev = str(i.get("severity","")).upper() if isinstance(i, dict) else ""
-                    if sev in counts:
-                        counts[sev]+=1
-            except Exception:
-                pass
+            if isinstance(summary, dict) and isinstance(summary.get("counts"), dict):
+                for sev in counts:
+                    counts[sev] = int(summary["counts"].get(sev, 0))
+            else:
+                try:
+                    for i in items:
+                        sev = str(i.get("severity","")).upper() if isinstance(i, dict) else ""
+                        if sev in counts:
+                            counts[sev]+=1
+                except Exception:
+                    pass
             if counts["HIGH"]>0:
                 updates.append(f"⚠️ Auditor detected HIGH risks: {counts['HIGH']}.")
             if counts["MEDIUM"]>0:
@@ -134,7 +166,7 @@ def detect_updates(prefs, state):
 
     return updates, recommendation, state
 
-def send_email_smtp(prefs, to_email, subject, text, html, attach_pdf=False, dry_run=True):
+def send_email_smtp(prefs, to_email, subject, text, html, attach_pdf=False, dry_run=True, report_path=GENERATOR_REPORT):
     msg = MIMEMultipart()
     msg["Subject"] = subject
     msg["From"] = prefs.get("email", "")
@@ -143,8 +175,8 @@ def send_email_smtp(prefs, to_email, subject, text, html, attach_pdf=False, dry_
     msg.attach(MIMEText(text, "plain"))
     msg.attach(MIMEText(html, "html"))
 
-    if attach_pdf and GENERATOR_REPORT.exists():
-        part = MIMEApplication(GENERATOR_REPORT.read_bytes(), _subtype="pdf")
+    if attach_pdf and report_path.exists():
+        part = MIMEApplication(report_path.read_bytes(), _subtype="pdf")
         part.add_header("Content-Disposition", "attachment", filename="ARCA_Report.pdf")
         msg.attach(part)
 
@@ -165,20 +197,21 @@ def send_email_smtp(prefs, to_email, subject, text, html, attach_pdf=False, dry_
 
     return msg
 
-def main(dry_run=True):
-    NEWSLETTERS_DIR.mkdir(parents=True, exist_ok=True)
-    LOGS_DIR.mkdir(parents=True, exist_ok=True)
-    STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
+def main(dry_run=True, tenant=DEFAULT_TENANT):
+    paths = tenant_paths(tenant)
+    paths["newsletters"].mkdir(parents=True, exist_ok=True)
+    paths["logs"].mkdir(parents=True, exist_ok=True)
+    paths["state"].parent.mkdir(parents=True, exist_ok=True)
 
-    if not USER_PREFS.exists():
-        print("[ERROR] user_preferences.json not found in NotificationsAgent folder.")
+    if not paths["prefs"].exists():
+        print(f"[ERROR] user_preferences.json not found: {paths['prefs']}")
         return
 
-    prefs = json.loads(USER_PREFS.read_text(encoding="utf-8"))
-    state = _load_state()
+    prefs = read_data(paths["prefs"])
+    state = _load_state(paths["state"])
 
-    updates, recommendation, new_state = detect_updates(prefs, state)
-    _save_state(new_state)
+    updates, recommendation, new_state = detect_updates(prefs, state, paths)
+    _save_state(new_state, paths["state"])
 
     if not updates:
         print("[INFO] No updates detected. Nothing to send.")
@@ -195,12 +228,12 @@ def main(dry_run=True):
     print("[INFO] Preparing message (dry_run={}):".format(dry_run))
 
     try:
-        msg = send_email_smtp(prefs, to_email, subject, text, html, attach_pdf=prefs.get("attach_pdf", False), dry_run=dry_run)
+        msg = send_email_smtp(prefs, to_email, subject, text, html, attach_pdf=prefs.get("attach_pdf", False), dry_run=dry_run, report_path=paths["generator"])
         ts = datetime.now().strftime("%Y_%m_%d_%H%M%S")
-        (NEWSLETTERS_DIR / f"newsletter_{ts}.html").write_text(html, encoding="utf-8")
-        (NEWSLETTERS_DIR / f"newsletter_{ts}.txt").write_text(text, encoding="utf-8")
+        (paths["newsletters"] / f"newsletter_{ts}.html").write_text(html, encoding="utf-8")
+        (paths["newsletters"] / f"newsletter_{ts}.txt").write_text(text, encoding="utf-8")
         log = {"sent_at": datetime.now().isoformat(), "updates": updates, "recommendation": recommendation, "dry_run": dry_run}
-        (LOGS_DIR / f"log_{ts}.json").write_text(json.dumps(log, indent=2), encoding="utf-8")
+        write_atomic(paths["logs"] / f"log_{ts}.json", log)
 
         if dry_run:
             print("[DRY RUN] Email prepared but NOT sent (dry-run).")
@@ -216,6 +249,7 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--send", action="store_true", help="Send real email (requires password in user_preferences.json)")
     parser.add_argument("--dry-run", action="store_true", help="Dry run (no email sent)")
+    parser.add_argument("--tenant", default=DEFAULT_TENANT, help="Tenant id (folder under tenants/)")
     args = parser.parse_args()
     dry = True if (args.dry_run or not args.send) else False
-    main(dry_run=dry)
+    main(dry_run=dry, tenant=args.tenant)
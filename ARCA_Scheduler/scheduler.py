@@ -0,0 +1,552 @@
+"""
+ARCA Scheduler
+
+One daemon runs every agent instead of the OS task scheduler, so the agents
+no longer race on their shared output files.
+
+- Jobs (schedule.json) run on cron-like schedules ("0 7 * * 1-5") and/or on
+  events: a watched set of files changed (e.g. policies/*.txt) or a new
+  regulation file was dropped in regulations/inbox/
+- A job may start other jobs when it succeeds ("then"), e.g.
+  auditor -> generator -> notifications
+- Queued runs are started by priority; runs triggered by a regulation get the
+  priority of its risk level, so HIGH-risk regulations are audited first
+- Resources limit concurrency (e.g. "model": 1, a single worker holding an
+  embedding model); a waiting high-priority run reserves its resources and
+  files, so lower-priority runs cannot starve it
+- File leases: a run holds a read lease on the files it reads and a write
+  lease on the files it writes. Writers are exclusive, so no stage reads
+  another stage's output while it is being produced
+
+Run:
+    python scheduler.py                   # daemon
+    python scheduler.py --once            # fire pending events, run, exit when idle
+    python scheduler.py --run generator   # run one job (and its "then" jobs), then exit
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import itertools
+import logging
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Set, Tuple
+
+
+# -------------------------------------------------------------------
+# Logging configuration
+# -------------------------------------------------------------------
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="[%(levelname)s] %(message)s",
+)
+logger = logging.getLogger("ARCA_Scheduler")
+
+
+# -------------------------------------------------------------------
+# Paths configuration (relative to this file)
+# -------------------------------------------------------------------
+
+BASE_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = BASE_DIR.parent
+
+# Shared code (arca_common) lives at the project root
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+from arca_common.serialization import read_data, write_atomic  # noqa: E402
+
+SCHEDULE_PATH = BASE_DIR / "schedule.json"
+STATE_PATH = BASE_DIR / "outputs" / "scheduler_state.json"
+LOGS_DIR = BASE_DIR / "outputs" / "logs"
+
+TICK_SECONDS = 1.0
+WATCH_INTERVAL_SECONDS = 10.0
+DEFAULT_TIMEOUT_SECONDS = 6 * 3600
+
+# Priority added per regulation risk level (same order as severity.SEVERITY_LEVELS)
+RISK_PRIORITY = {"LOW": 0, "MEDIUM": 10, "HIGH": 20}
+DEFAULT_RISK_LEVEL = "MEDIUM"
+
+
+# -------------------------------------------------------------------
+# Cron expressions
+# -------------------------------------------------------------------
+
+_CRON_ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+}
+_CRON_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 6)]
+
+
+def _parse_cron_field(text: str, low: int, high: int) -> FrozenSet[int]:
+    values: Set[int] = set()
+    for part in text.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            step = int(step_text)
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start_text, end_text = part.split("-", 1)
+            start, end = int(start_text), int(end_text)
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if step < 1 or start < low or end > high or start > end:
+            raise ValueError(f"Invalid cron field {text!r} (allowed {low}-{high})")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+@dataclass(frozen=True)
+class CronSchedule:
+    """
+    Standard 5-field cron: minute hour day-of-month month day-of-week (0 = Sunday).
+    As in cron, when both day fields are restricted a day matching either is due.
+    """
+    expression: str
+    minutes: FrozenSet[int]
+    hours: FrozenSet[int]
+    days: FrozenSet[int]
+    months: FrozenSet[int]
+    weekdays: FrozenSet[int]
+    any_day: bool
+    any_weekday: bool
+
+    @classmethod
+    def parse(cls, expression: str) -> "CronSchedule":
+        fields = _CRON_ALIASES.get(expression.strip(), expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression!r}")
+        parsed = [_parse_cron_field(f, low, high) for f, (low, high) in zip(fields, _CRON_RANGES)]
+        return cls(expression, *parsed, any_day=fields[2] == "*", any_weekday=fields[4] == "*")
+
+    def matches(self, moment: datetime) -> bool:
+        if moment.minute not in self.minutes or moment.hour not in self.hours or moment.month not in self.months:
+            return False
+        day_ok = moment.day in self.days
+        weekday_ok = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+
+# -------------------------------------------------------------------
+# Jobs
+# -------------------------------------------------------------------
+
+@dataclass
+class JobSpec:
+    name: str
+    command: List[str]
+    cwd: Path
+    cron: Optional[CronSchedule] = None
+    triggers: List[str] = field(default_factory=list)
+    resources: List[str] = field(default_factory=list)
+    reads: List[Path] = field(default_factory=list)
+    writes: List[Path] = field(default_factory=list)
+    priority: int = 0
+    then: List[str] = field(default_factory=list)
+    timeout: float = DEFAULT_TIMEOUT_SECONDS
+
+    @classmethod
+    def from_raw(cls, raw: Dict[str, Any]) -> "JobSpec":
+        if not raw.get("name") or not raw.get("command"):
+            raise ValueError(f"Job needs a name and a command: {raw}")
+        return cls(
+            name=str(raw["name"]),
+            command=[str(part) for part in raw["command"]],
+            cwd=PROJECT_ROOT / raw.get("cwd", "."),
+            cron=CronSchedule.parse(raw["cron"]) if raw.get("cron") else None,
+            triggers=list(raw.get("triggers", [])),
+            resources=list(raw.get("resources", [])),
+            reads=[PROJECT_ROOT / p for p in raw.get("reads", [])],
+            writes=[PROJECT_ROOT / p for p in raw.get("writes", [])],
+            priority=int(raw.get("priority", 0)),
+            then=list(raw.get("then", [])),
+            timeout=float(raw.get("timeout", DEFAULT_TIMEOUT_SECONDS)),
+        )
+
+    @property
+    def per_file(self) -> bool:
+        """A job whose command contains {file} runs once per changed file."""
+        return any("{file}" in part for part in self.command)
+
+
+@dataclass
+class JobRun:
+    spec: JobSpec
+    priority: int
+    reason: str
+    file: Optional[Path] = None
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return self.spec.name, str(self.file or "")
+
+    def argv(self) -> List[str]:
+        argv = [part.replace("{file}", str(self.file or "")) for part in self.spec.command]
+        if argv and argv[0] == "python":
+            argv[0] = sys.executable
+        return argv
+
+
+def load_schedule(path: Path = SCHEDULE_PATH) -> Tuple[Dict[str, JobSpec], Dict[str, List[str]], Dict[str, int]]:
+    """
+    Loads schedule.json. Returns (jobs by name, watch name -> glob patterns,
+    resource -> capacity).
+    """
+    data = read_data(path)
+    jobs = {spec.name: spec for spec in (JobSpec.from_raw(raw) for raw in data.get("jobs", []))}
+    watches = {name: list(patterns) for name, patterns in data.get("watch", {}).items()}
+    resources = {name: int(capacity) for name, capacity in data.get("resources", {}).items()}
+
+    for spec in jobs.values():
+        for name in spec.then:
+            if name not in jobs:
+                raise ValueError(f"Job '{spec.name}' starts unknown job '{name}'")
+        for name in spec.triggers:
+            if name not in watches:
+                raise ValueError(f"Job '{spec.name}' uses unknown trigger '{name}'")
+    return jobs, watches, resources
+
+
+# -------------------------------------------------------------------
+# Events: watched files
+# -------------------------------------------------------------------
+
+def _file_digest(path: Path) -> str:
+    s = path.stat()
+    return f"{s.st_mtime_ns}::{s.st_size}"
+
+
+class FileWatcher:
+    """
+    Polls glob patterns (relative to the project root) and reports the files
+    added or modified since the last poll. Digests are persisted, so changes
+    made while the daemon was stopped are picked up at start.
+    """
+
+    def __init__(self, watches: Dict[str, List[str]], state: Dict[str, Dict[str, str]]) -> None:
+        self.watches = watches
+        self.digests = state
+
+    def _scan(self, patterns: Sequence[str]) -> Dict[str, str]:
+        files: Dict[str, str] = {}
+        for pattern in patterns:
+            for path in PROJECT_ROOT.glob(pattern):
+                if path.is_file():
+                    files[str(path)] = _file_digest(path)
+        return files
+
+    def poll(self) -> Dict[str, List[Path]]:
+        """
+        Returns watch name -> changed files, for the watches that changed.
+        A removed file counts as a change but is not listed.
+        """
+        changes: Dict[str, List[Path]] = {}
+        for name, patterns in self.watches.items():
+            current = self._scan(patterns)
+            previous = self.digests.get(name, {})
+            if current == previous:
+                continue
+            changes[name] = [Path(f) for f, digest in sorted(current.items()) if previous.get(f) != digest]
+            self.digests[name] = current
+        return changes
+
+
+def regulation_risk_level(path: Path) -> str:
+    """
+    Highest "risk_level" of the regulations of an inbox file
+    ([{"regulation_id", "text", "risk_level"?}]), DEFAULT_RISK_LEVEL if none.
+    """
+    try:
+        data = read_data(path)
+    except Exception:
+        return DEFAULT_RISK_LEVEL
+    entries = data if isinstance(data, list) else [data]
+    levels = [str(e.get("risk_level", "")).upper() for e in entries if isinstance(e, dict)]
+    levels = [level for level in levels if level in RISK_PRIORITY]
+    return max(levels, key=RISK_PRIORITY.get) if levels else DEFAULT_RISK_LEVEL
+
+
+# -------------------------------------------------------------------
+# Concurrency: resources and file leases
+# -------------------------------------------------------------------
+
+def _overlaps(a: Path, b: Path) -> bool:
+    # a lease on a folder covers every file below it
+    return a == b or a in b.parents or b in a.parents
+
+
+class LeaseTable:
+    """
+    Read/write leases on files and folders: many readers or one writer.
+    """
+
+    def __init__(self) -> None:
+        self.readers: Dict[Path, int] = {}
+        self.writers: Set[Path] = set()
+
+    @staticmethod
+    def conflicts(reads: Sequence[Path], writes: Sequence[Path], held_reads: Any, held_writes: Any) -> bool:
+        for w in writes:
+            if any(_overlaps(w, p) for p in held_writes) or any(_overlaps(w, p) for p in held_reads):
+                return True
+        return any(_overlaps(r, p) for r in reads for p in held_writes)
+
+    def available(self, reads: Sequence[Path], writes: Sequence[Path]) -> bool:
+        return not self.conflicts(reads, writes, self.readers, self.writers)
+
+    def acquire(self, reads: Sequence[Path], writes: Sequence[Path]) -> None:
+        for r in reads:
+            self.readers[r] = self.readers.get(r, 0) + 1
+        self.writers.update(writes)
+
+    def release(self, reads: Sequence[Path], writes: Sequence[Path]) -> None:
+        for r in reads:
+            self.readers[r] -= 1
+            if not self.readers[r]:
+                del self.readers[r]
+        self.writers.difference_update(writes)
+
+
+# -------------------------------------------------------------------
+# Scheduler
+# -------------------------------------------------------------------
+
+class Scheduler:
+    def __init__(
+        self,
+        jobs: Dict[str, JobSpec],
+        watches: Dict[str, List[str]],
+        resources: Dict[str, int],
+        state_path: Path = STATE_PATH,
+    ) -> None:
+        self.jobs = jobs
+        self.capacity = resources
+        self.in_use: Dict[str, int] = {name: 0 for name in resources}
+        self.leases = LeaseTable()
+        self.state_path = state_path
+        state = read_data(state_path) if state_path.exists() else {}
+        self.watcher = FileWatcher(watches, state.get("digests", {}))
+        self.history: Dict[str, Dict[str, Any]] = state.get("history", {})
+
+        self._queue: List[Tuple[int, int, JobRun]] = []  # (-priority, seq, run)
+        self._seq = itertools.count()
+        self._running: Dict[Tuple[str, str], JobRun] = {}
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._last_minute: Optional[datetime] = None
+        self._last_watch: Optional[float] = None
+
+        for spec in jobs.values():
+            for name in spec.resources:
+                if name not in self.capacity:
+                    raise ValueError(f"Job '{spec.name}' uses unknown resource '{name}'")
+
+    # --- queue -------------------------------------------------------
+
+    def submit(self, name: str, reason: str, priority: Optional[int] = None, file: Optional[Path] = None) -> None:
+        """
+        Queues a run of a job. A run already queued for the same job (and
+        file) is not duplicated; it keeps the highest priority.
+        """
+        spec = self.jobs[name]
+        priority = spec.priority if priority is None else max(priority, spec.priority)
+        run = JobRun(spec, priority, reason, file)
+        with self._lock:
+            for i, (neg_priority, seq, queued) in enumerate(self._queue):
+                if queued.key == run.key:
+                    if priority > -neg_priority:
+                        self._queue[i] = (-priority, seq, queued)
+                        queued.priority = priority
+                        heapq.heapify(self._queue)
+                    return
+            heapq.heappush(self._queue, (-priority, next(self._seq), run))
+        logger.info(f"Queued {name}{f' ({run.file.name})' if run.file else ''}: {reason} [priority {priority}]")
+
+    @property
+    def idle(self) -> bool:
+        with self._lock:
+            return not self._queue and not self._running
+
+    # --- events ------------------------------------------------------
+
+    def _fire_cron(self, now: datetime) -> None:
+        minute = now.replace(second=0, microsecond=0)
+        if minute == self._last_minute:
+            return
+        self._last_minute = minute
+        for spec in self.jobs.values():
+            if spec.cron is not None and spec.cron.matches(minute):
+                self.submit(spec.name, f"cron {spec.cron.expression}")
+
+    def _fire_watches(self) -> None:
+        changes = self.watcher.poll()
+        if not changes:
+            return
+        for watch, files in changes.items():
+            for spec in self.jobs.values():
+                if watch not in spec.triggers:
+                    continue
+                if not spec.per_file:
+                    self.submit(spec.name, f"{watch} changed")
+                    continue
+                for path in files:
+                    level = regulation_risk_level(path)
+                    self.submit(spec.name, f"new {watch} file ({level})", spec.priority + RISK_PRIORITY[level], path)
+        self._save_state()
+
+    def _save_state(self) -> None:
+        with self._lock:
+            state = {"digests": self.watcher.digests, "history": dict(self.history)}
+        write_atomic(self.state_path, state)
+
+    # --- dispatch ----------------------------------------------------
+
+    def _dispatch(self) -> None:
+        """
+        Starts the queued runs that can run now, highest priority first.
+        A run that must wait reserves its resources and files: lower-priority
+        runs needing them wait too.
+        """
+        with self._lock:
+            reserved_resources: Set[str] = set()
+            reserved_reads: List[Path] = []
+            reserved_writes: List[Path] = []
+            waiting: List[Tuple[int, int, JobRun]] = []
+
+            while self._queue:
+                item = heapq.heappop(self._queue)
+                run = item[2]
+                spec = run.spec
+                blocked = (
+                    run.key in self._running
+                    or any(r in reserved_resources for r in spec.resources)
+                    or LeaseTable.conflicts(spec.reads, spec.writes, reserved_reads, reserved_writes)
+                )
+                free = all(self.in_use[r] < self.capacity[r] for r in spec.resources)
+                if blocked or not free or not self.leases.available(spec.reads, spec.writes):
+                    waiting.append(item)
+                    reserved_resources.update(spec.resources)
+                    reserved_reads.extend(spec.reads)
+                    reserved_writes.extend(spec.writes)
+                    continue
+
+                for r in spec.resources:
+                    self.in_use[r] += 1
+                self.leases.acquire(spec.reads, spec.writes)
+                self._running[run.key] = run
+                thread = threading.Thread(target=self._execute, args=(run,), name=f"job-{spec.name}", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+
+            for item in waiting:
+                heapq.heappush(self._queue, item)
+            self._threads = [t for t in self._threads if t.is_alive()]
+
+    def _execute(self, run: JobRun) -> None:
+        spec = run.spec
+        started = datetime.now()
+        LOGS_DIR.mkdir(parents=True, exist_ok=True)
+        log_path = LOGS_DIR / f"{spec.name}_{started.strftime('%Y_%m_%d_%H%M%S_%f')}.log"
+        logger.info(f"Starting {spec.name} ({run.reason})")
+
+        try:
+            with log_path.open("w", encoding="utf-8") as log:
+                proc = subprocess.run(
+                    run.argv(), cwd=spec.cwd, stdout=log, stderr=subprocess.STDOUT, timeout=spec.timeout,
+                )
+            status = "ok" if proc.returncode == 0 else f"exit code {proc.returncode}"
+        except subprocess.TimeoutExpired:
+            status = f"timeout after {spec.timeout:.0f}s"
+        except Exception as e:
+            status = f"failed to start: {e}"
+
+        if status == "ok":
+            logger.info(f"{spec.name} completed")
+            # queued before the leases are released: the scheduler is never idle in between
+            for name in spec.then:
+                self.submit(name, f"after {spec.name}", run.priority)
+        else:
+            logger.error(f"{spec.name} {status} (see {log_path})")
+
+        with self._lock:
+            for r in spec.resources:
+                self.in_use[r] -= 1
+            self.leases.release(spec.reads, spec.writes)
+            self._running.pop(run.key, None)
+            self.history[spec.name] = {
+                "started_at": started.isoformat(),
+                "finished_at": datetime.now().isoformat(),
+                "status": status,
+                "reason": run.reason,
+                "log": str(log_path),
+            }
+        self._save_state()
+
+    # --- main loop ---------------------------------------------------
+
+    def tick(self, now: Optional[datetime] = None) -> None:
+        self._fire_cron(now or datetime.now())
+        if self._last_watch is None or time.monotonic() - self._last_watch >= WATCH_INTERVAL_SECONDS:
+            self._last_watch = time.monotonic()
+            self._fire_watches()
+        self._dispatch()
+
+    def run_forever(self, until_idle: bool = False) -> None:
+        logger.info(f"Scheduler started with {len(self.jobs)} jobs")
+        while not self._stop.is_set():
+            self.tick()
+            if until_idle and self.idle:
+                break
+            self._stop.wait(TICK_SECONDS)
+        for thread in self._threads:
+            thread.join()
+        logger.info("Scheduler stopped")
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+# -------------------------------------------------------------------
+# Main entrypoint (when running `python scheduler.py`)
+# -------------------------------------------------------------------
+
+def main(schedule_path: Path = SCHEDULE_PATH, once: bool = False, run: Optional[List[str]] = None) -> None:
+    jobs, watches, resources = load_schedule(schedule_path)
+    scheduler = Scheduler(jobs, watches, resources)
+    for name in run or []:
+        if name not in jobs:
+            raise SystemExit(f"Unknown job: {name}")
+        if jobs[name].per_file:
+            raise SystemExit(f"Job {name} runs on {{file}} events only")
+        scheduler.submit(name, "manual run")
+
+    try:
+        scheduler.run_forever(until_idle=once or bool(run))
+    except KeyboardInterrupt:
+        scheduler.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ARCA scheduler daemon")
+    parser.add_argument("--schedule", type=Path, default=SCHEDULE_PATH, help="Jobs configuration (schedule.json)")
+    parser.add_argument("--once", action="store_true", help="Fire pending events, run the queue, exit when idle")
+    parser.add_argument("--run", nargs="+", metavar="JOB", help="Run these jobs (and the jobs they start), then exit")
+    args = parser.parse_args()
+    main(schedule_path=args.schedule, once=args.once, run=args.run)
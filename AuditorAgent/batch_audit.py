@@ -0,0 +1,539 @@
+"""
+Resumable batch audits for the AuditorAgent
+
+A nightly run audits many regulations against the whole policies/ corpus.
+The work is split into tasks = (run, regulation, policy shard) stored in a
+SQLite work queue (outputs/batch/queue.sqlite):
+
+- a run is identified by its run id (the date by default), so the same
+  regulation is audited again by the next night's run
+- a regulation is keyed by a hash of its id and text: a changed text is a
+  new regulation, and two ids never share a folder
+- enqueue is idempotent within a run: re-running it never duplicates tasks,
+  and the policy shards of a run are fixed by its first enqueue
+- tasks of HIGH-risk regulations are claimed first (the regulation's
+  "risk_level" if given, else the highest severity of its last audit)
+- several worker processes can claim tasks concurrently (claims are done in
+  an IMMEDIATE transaction); a task claimed by a crashed worker is claimed
+  again once its lease expires, or marked failed after MAX_ATTEMPTS claims
+- a worker embeds each policy chunk once per model (reusing the ingestion
+  embedding shards), with the model of the (regulation, chunk) language pair
+- every finished task writes its checkpoint (shard results) atomically and
+  records it in the queue before being marked done, so a restart skips
+  finished pairs; only the checkpoint recorded for the task is ever reused
+- collect merges the checkpoints of a regulation into one auditor output
+  (outputs/batch/<run_id>/<regulation_key>/auditor_output.json); shards that
+  failed are listed in it ("failed_shards") and by the status command
+
+Run:
+    python batch_audit.py enqueue regulations.json [--run-id 2024-05-01]
+                                                     # [{"regulation_id": ..., "text": ..., "risk_level"?: ...}]
+    python batch_audit.py work                       # start as many as needed
+    python batch_audit.py collect
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import socket
+import sqlite3
+import sys
+import time
+from contextlib import closing
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from corpus import POLICIES_DIR, iter_policy_files, load_policy_chunks, text_hash
+from dedup import find_policy_duplicates, non_representatives
+from embeddings import detect_language, encode_cached, load_embedding_cache, pair_model_name
+from severity import SEVERITY_LEVELS, apply_severity
+
+# Shared code (arca_common) lives at the project root
+_PROJECT_ROOT = str(Path(__file__).resolve().parent.parent)
+if _PROJECT_ROOT not in sys.path:
+    sys.path.append(_PROJECT_ROOT)
+from arca_common.serialization import INTERNAL_SUFFIX, read_data, write_atomic  # noqa: E402
+from arca_common.tenancy import tenant_paths  # noqa: E402
+
+
+logger = logging.getLogger("AuditorAgent.batch_audit")
+
+
+# -------------------------------------------------------------------
+# Config
+# -------------------------------------------------------------------
+
+BASE_DIR = Path(__file__).resolve().parent
+BATCH_DIR = BASE_DIR / "outputs" / "batch"
+QUEUE_PATH = BATCH_DIR / "queue.sqlite"
+EMBEDDINGS_DIR = tenant_paths().embeddings_dir  # ingestion embedding shards
+
+SHARD_SIZE = 50  # policy files per shard
+SHARD_TOP_K = 20  # passages kept per (regulation, shard) checkpoint
+REPORT_TOP_K = 20  # passages kept per regulation after collect
+LEASE_SECONDS = 30 * 60  # a running task older than this is claimed again
+MAX_ATTEMPTS = 3
+DEFAULT_RISK_LEVEL = "MEDIUM"  # regulations never audited and without "risk_level"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    shards TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS regulations (
+    run_id TEXT NOT NULL,
+    regulation_key TEXT NOT NULL,
+    regulation_id TEXT NOT NULL,
+    text TEXT NOT NULL,
+    output TEXT,
+    collected_at REAL,
+    PRIMARY KEY (run_id, regulation_key)
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    run_id TEXT NOT NULL,
+    regulation_key TEXT NOT NULL,
+    shard INTEGER NOT NULL,
+    policies TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 1,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    claimed_at REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    checkpoint TEXT,
+    error TEXT,
+    PRIMARY KEY (run_id, regulation_key, shard)
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, claimed_at);
+CREATE INDEX IF NOT EXISTS regulations_id ON regulations (regulation_id, collected_at);
+"""
+
+
+_RUN_ID_RE = re.compile(r"[A-Za-z0-9_-]+")  # also a folder name under BATCH_DIR
+
+
+def default_run_id() -> str:
+    return time.strftime("%Y-%m-%d")
+
+
+# -------------------------------------------------------------------
+# Queue
+# -------------------------------------------------------------------
+
+def connect(path: Path = QUEUE_PATH) -> sqlite3.Connection:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(tasks)")}
+    if columns and "run_id" not in columns:
+        # queue created before runs: keep its rows aside, start a new queue
+        conn.executescript(
+            """
+            DROP INDEX IF EXISTS tasks_status;
+            ALTER TABLE tasks RENAME TO tasks_v1;
+            ALTER TABLE regulations RENAME TO regulations_v1;
+            """
+        )
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def regulation_key(regulation_id: str, text: str) -> str:
+    """
+    Folder-safe, collision-free key of a regulation version: its sanitized id
+    (for readability) plus a hash of the exact id and text.
+    """
+    digest = hashlib.sha256(f"{regulation_id}\0{text}".encode("utf-8")).hexdigest()[:16]
+    return f"{_safe_name(regulation_id)[:64]}-{digest}"
+
+
+def policy_shards(policies_dir: Path = POLICIES_DIR, shard_size: int = SHARD_SIZE) -> List[List[str]]:
+    """
+    Splits the (deduplicated) policy files into stable, sorted shards.
+    """
+    skipped = non_representatives(find_policy_duplicates(policies_dir))
+    names = [p.name for p in iter_policy_files(policies_dir) if p.name not in skipped]
+    return [names[i:i + shard_size] for i in range(0, len(names), shard_size)]
+
+
+def regulation_priority(conn: sqlite3.Connection, regulation: Dict[str, str]) -> int:
+    """
+    Index of the regulation's risk level in SEVERITY_LEVELS (HIGH = 2): its
+    "risk_level" if given, else the highest severity of its last collected
+    audit (any run, any text version), else DEFAULT_RISK_LEVEL.
+    """
+    level = str(regulation.get("risk_level") or "").upper()
+    if level not in SEVERITY_LEVELS:
+        row = conn.execute(
+            """
+            SELECT output FROM regulations
+            WHERE regulation_id = ? AND output IS NOT NULL
+            ORDER BY collected_at DESC LIMIT 1
+            """,
+            (regulation["regulation_id"],),
+        ).fetchone()
+        if row is not None and Path(row[0]).exists():
+            level = read_data(Path(row[0])).get("severity_summary", {}).get("highest_severity") or ""
+    if level not in SEVERITY_LEVELS:
+        level = DEFAULT_RISK_LEVEL
+    return int(np.nonzero(SEVERITY_LEVELS == level)[0][0])
+
+
+def enqueue(
+    conn: sqlite3.Connection,
+    regulations: List[Dict[str, str]],
+    shards: List[List[str]],
+    run_id: Optional[str] = None,
+) -> int:
+    """
+    Adds one task per (regulation, shard) to run run_id (default: today),
+    with the regulation's priority. The shards given to the first enqueue
+    of a run are stored and used by every later enqueue of that run, so a
+    policy change mid-run cannot skip or repeat policies. Existing tasks of
+    the run are left untouched, so enqueue can be re-run safely; a later run
+    audits the regulations again. Returns the number of new tasks.
+    """
+    run_id = run_id or default_run_id()
+    if not _RUN_ID_RE.fullmatch(run_id):
+        raise ValueError(f"Invalid run id: {run_id!r}")
+    before = conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+    priorities = [regulation_priority(conn, reg) for reg in regulations]
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("INSERT OR IGNORE INTO runs (run_id, shards) VALUES (?, ?)", (run_id, json.dumps(shards)))
+        frozen = json.loads(conn.execute("SELECT shards FROM runs WHERE run_id = ?", (run_id,)).fetchone()[0])
+        if frozen != shards:
+            logger.info(f"Run {run_id}: policies changed since its first enqueue, keeping its shards")
+        for reg, priority in zip(regulations, priorities):
+            key = regulation_key(reg["regulation_id"], reg["text"])
+            conn.execute(
+                "INSERT OR IGNORE INTO regulations (run_id, regulation_key, regulation_id, text) VALUES (?, ?, ?, ?)",
+                (run_id, key, reg["regulation_id"], reg["text"]),
+            )
+            for shard, policies in enumerate(frozen):
+                conn.execute(
+                    """
+                    INSERT OR IGNORE INTO tasks (run_id, regulation_key, shard, policies, priority)
+                    VALUES (?, ?, ?, ?, ?)
+                    """,
+                    (run_id, key, shard, json.dumps(policies), priority),
+                )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0] - before
+
+
+@dataclass
+class Task:
+    run_id: str
+    regulation_key: str
+    shard: int
+    regulation_id: str
+    text: str
+    policies: List[str]
+    checkpoint: Optional[str]  # recorded by a previous attempt of this task
+
+    @property
+    def name(self) -> str:
+        return f"{self.run_id}/{self.regulation_id}/{self.shard}"
+
+
+def claim_task(conn: sqlite3.Connection, worker: str, lease_seconds: float = LEASE_SECONDS) -> Optional[Task]:
+    """
+    Atomically claims one pending task (or a running one whose lease expired),
+    highest priority first, oldest run first. Returns the Task or None.
+    A running task whose lease expired after MAX_ATTEMPTS claims is marked
+    failed instead (its worker crashed on every attempt).
+    """
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(
+            """
+            UPDATE tasks SET status = 'failed', error = COALESCE(error, ?)
+            WHERE status = 'running' AND claimed_at < ? AND attempts >= ?
+            """,
+            (f"lease expired on all {MAX_ATTEMPTS} attempts", now - lease_seconds, MAX_ATTEMPTS),
+        )
+        row = conn.execute(
+            """
+            SELECT t.run_id, t.regulation_key, t.shard, r.regulation_id, r.text, t.policies, t.checkpoint
+            FROM tasks t JOIN regulations r ON r.run_id = t.run_id AND r.regulation_key = t.regulation_key
+            WHERE (t.status = 'pending' OR (t.status = 'running' AND t.claimed_at < ?))
+              AND t.attempts < ?
+            ORDER BY t.priority DESC, t.run_id, t.regulation_key, t.shard
+            LIMIT 1
+            """,
+            (now - lease_seconds, MAX_ATTEMPTS),
+        ).fetchone()
+        if row is not None:
+            conn.execute(
+                """
+                UPDATE tasks SET status = 'running', worker = ?, claimed_at = ?, attempts = attempts + 1
+                WHERE run_id = ? AND regulation_key = ? AND shard = ?
+                """,
+                (worker, now, row[0], row[1], row[2]),
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+    if row is None:
+        return None
+    return Task(row[0], row[1], row[2], row[3], row[4], json.loads(row[5]), row[6])
+
+
+def _update_task(conn: sqlite3.Connection, task: Task, worker: str, **fields: Any) -> None:
+    assignments = ", ".join(f"{name} = ?" for name in fields)
+    conn.execute(
+        f"UPDATE tasks SET {assignments} WHERE run_id = ? AND regulation_key = ? AND shard = ? AND worker = ?",
+        (*fields.values(), task.run_id, task.regulation_key, task.shard, worker),
+    )
+
+
+# -------------------------------------------------------------------
+# Checkpoints
+# -------------------------------------------------------------------
+
+def _safe_name(regulation_id: str) -> str:
+    return "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in regulation_id)
+
+
+def regulation_dir(run_id: str, key: str) -> Path:
+    return BATCH_DIR / run_id / key
+
+
+def checkpoint_path(task: Task) -> Path:
+    return regulation_dir(task.run_id, task.regulation_key) / f"shard_{task.shard:05d}{INTERNAL_SUFFIX}"
+
+
+@dataclass
+class ShardCache:
+    """
+    What a worker keeps between tasks: embeddings per model, keyed by text
+    hash (seeded from the ingestion shards of cache_dir), and the language of
+    every chunk seen, so the corpus is embedded at most once per model
+    whatever the number of regulations.
+    """
+    cache_dir: Optional[Path] = EMBEDDINGS_DIR
+    embeddings: Dict[str, Dict[str, np.ndarray]] = field(default_factory=dict)
+    languages: Dict[str, str] = field(default_factory=dict)
+
+    def for_model(self, model_name: str) -> Dict[str, np.ndarray]:
+        cache = self.embeddings.get(model_name)
+        if cache is None:
+            cache = self.embeddings[model_name] = load_embedding_cache(self.cache_dir, model_name)
+        return cache
+
+    def language(self, text: str) -> str:
+        h = text_hash(text)
+        if h not in self.languages:
+            self.languages[h] = detect_language(text)
+        return self.languages[h]
+
+
+def audit_shard(
+    regulation_text: str,
+    policies: List[str],
+    top_k: int = SHARD_TOP_K,
+    cache: Optional[ShardCache] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Scores every chunk of the shard's policies against the regulation, each
+    with the model of its (regulation, chunk) language pair, and returns the
+    top_k rows in the auditor schema (severity not set yet).
+    """
+    cache = cache if cache is not None else ShardCache()
+    chunks = load_policy_chunks(include=set(policies))
+    if not chunks:
+        return []
+
+    language = detect_language(regulation_text)
+    groups: Dict[str, List[int]] = {}
+    for i, chunk in enumerate(chunks):
+        groups.setdefault(pair_model_name(language, cache.language(chunk.text)), []).append(i)
+
+    scores = np.zeros(len(chunks), dtype=np.float32)
+    models = [""] * len(chunks)
+    for model_name, ids in groups.items():
+        embeddings = cache.for_model(model_name)
+        regulation_emb = encode_cached(model_name, [regulation_text], embeddings)[0]
+        scores[ids] = encode_cached(model_name, [chunks[i].text for i in ids], embeddings) @ regulation_emb
+        for i in ids:
+            models[i] = model_name
+    best = np.argsort(-scores, kind="stable")[:top_k]
+
+    return [
+        {
+            "policy_id": chunks[i].policy_id,
+            "severity": None,
+            "divergence_summary": "",
+            "conflicting_policy_excerpt": chunks[i].text,
+            "new_rule_excerpt": regulation_text,
+            "recommendation": "Review and update internal policy if needed",
+            "similarity": round(float(scores[i]), 4),
+            "embedding_model": models[i],
+        }
+        for i in best
+    ]
+
+
+# -------------------------------------------------------------------
+# Worker / collect
+# -------------------------------------------------------------------
+
+def run_worker(conn: sqlite3.Connection, worker: Optional[str] = None) -> int:
+    """
+    Claims and processes tasks until the queue is empty.
+    Returns the number of tasks completed by this worker.
+    """
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    cache = ShardCache()
+    done = 0
+    while True:
+        task = claim_task(conn, worker)
+        if task is None:
+            break
+        path = checkpoint_path(task)
+        try:
+            # a previous attempt may have crashed after recording its checkpoint: reuse it
+            if task.checkpoint != str(path) or not path.exists():
+                write_atomic(path, audit_shard(task.text, task.policies, cache=cache))
+                _update_task(conn, task, worker, checkpoint=str(path))
+        except Exception as e:
+            logger.exception(f"Task {task.name} failed")
+            conn.execute(
+                """
+                UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, error = ?
+                WHERE run_id = ? AND regulation_key = ? AND shard = ? AND worker = ?
+                """,
+                (MAX_ATTEMPTS, str(e), task.run_id, task.regulation_key, task.shard, worker),
+            )
+            continue
+        _update_task(conn, task, worker, status="done", error=None)
+        done += 1
+        logger.info(f"[{worker}] {task.name} done")
+
+    logger.info(f"[{worker}] no more tasks ({done} completed)")
+    return done
+
+
+def progress(conn: sqlite3.Connection) -> Dict[str, int]:
+    rows = conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall()
+    return {status: count for status, count in rows}
+
+
+def failed_tasks(conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+    """
+    Tasks that used up their attempts: one dict per failed shard.
+    """
+    rows = conn.execute(
+        """
+        SELECT t.run_id, r.regulation_id, t.regulation_key, t.shard, t.error
+        FROM tasks t JOIN regulations r ON r.run_id = t.run_id AND r.regulation_key = t.regulation_key
+        WHERE t.status = 'failed'
+        ORDER BY t.run_id, r.regulation_id, t.shard
+        """
+    ).fetchall()
+    return [
+        {"run_id": run_id, "regulation_id": regulation_id, "regulation_key": key, "shard": shard, "error": error}
+        for run_id, regulation_id, key, shard, error in rows
+    ]
+
+
+def collect(conn: sqlite3.Connection, top_k: int = REPORT_TOP_K) -> List[Path]:
+    """
+    For every regulation of every run whose tasks are all finished (done or
+    failed) and which was not collected yet, merges its checkpoints into
+    BATCH_DIR/<run_id>/<regulation_key>/auditor_output.json. Failed shards
+    are listed under "failed_shards" (the results then miss their policies).
+    Returns written paths.
+    """
+    written: List[Path] = []
+    regulations = conn.execute(
+        """
+        SELECT t.run_id, t.regulation_key
+        FROM tasks t JOIN regulations r ON r.run_id = t.run_id AND r.regulation_key = t.regulation_key
+        WHERE r.output IS NULL
+        GROUP BY t.run_id, t.regulation_key
+        HAVING SUM(t.status NOT IN ('done', 'failed')) = 0
+        """
+    ).fetchall()
+
+    for run_id, key in regulations:
+        rows: List[Dict[str, Any]] = []
+        failed: List[Dict[str, Any]] = []
+        for shard, status, checkpoint, error in conn.execute(
+            """
+            SELECT shard, status, checkpoint, error FROM tasks
+            WHERE run_id = ? AND regulation_key = ? ORDER BY shard
+            """,
+            (run_id, key),
+        ).fetchall():
+            if status == "done":
+                rows.extend(read_data(Path(checkpoint)))
+            else:
+                failed.append({"shard": shard, "error": error})
+
+        rows.sort(key=lambda r: r["similarity"], reverse=True)
+        rows = rows[:top_k]
+        output = {"results": rows, "severity_summary": apply_severity(rows)}
+        if failed:
+            output["failed_shards"] = failed
+            logger.warning(f"Run {run_id}, {key}: {len(failed)} failed shards, results are incomplete")
+        path = regulation_dir(run_id, key) / "auditor_output.json"
+        write_atomic(path, output)
+        conn.execute(
+            "UPDATE regulations SET output = ?, collected_at = ? WHERE run_id = ? AND regulation_key = ?",
+            (str(path), time.time(), run_id, key),
+        )
+        written.append(path)
+
+    logger.info(f"Collected {len(written)} completed regulations")
+    return written
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Resumable batch audits")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_enqueue = sub.add_parser("enqueue", help="Add regulations to the work queue")
+    p_enqueue.add_argument("regulations", type=Path, help='JSON list of {"regulation_id", "text"}')
+    p_enqueue.add_argument("--shard-size", type=int, default=SHARD_SIZE)
+    p_enqueue.add_argument("--run-id", default=None, help="Run to add the tasks to (default: today's date)")
+    p_work = sub.add_parser("work", help="Process tasks until the queue is empty")
+    p_work.add_argument("--worker-id", default=None)
+    sub.add_parser("collect", help="Merge finished regulations")
+    sub.add_parser("status", help="Show task counts")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+
+    with closing(connect()) as conn:
+        if args.command == "enqueue":
+            regulations = json.loads(args.regulations.read_text(encoding="utf-8"))
+            added = enqueue(conn, regulations, policy_shards(shard_size=args.shard_size), run_id=args.run_id)
+            logger.info(f"{added} new tasks enqueued")
+        elif args.command == "work":
+            run_worker(conn, args.worker_id)
+        elif args.command == "collect":
+            collect(conn)
+        for task in failed_tasks(conn):
+            logger.warning(
+                f"Failed: run {task['run_id']}, regulation {task['regulation_id']}, "
+                f"shard {task['shard']}: {task['error']}"
+            )
+        print(json.dumps(progress(conn), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+Chat retrieval backend for the ChatARCA page
+
+- Retrieves the top policy passages for a question with the tenant's
+  shared hybrid retriever (BM25 + embeddings merged with RRF); passages are
+  embedded once per tenant index, never per session
+- Builds a grounded, extractive answer from the best sentences of those
+  passages, each sentence citing its policy file; no outside service needed
+- Streams the result over Server-Sent Events: the cited passages first,
+  then the answer word by word, then a final "done" event
+- Each chat session caches (bounded LRUs) its query embeddings and the
+  passages retrieved per question, so follow-up questions re-use them; the
+  caches are cleared when the tenant index is rebuilt
+
+Run:
+    python chat_backend.py --port 8766
+    GET /api/chat/stream?session=<id>&q=<question>[&tenant=<tenant_id>]
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from corpus import index_terms
+from embeddings import detect_language, encode, model_name_for_language
+from tenants import DEFAULT_TENANT, TenantIndex, TenantRegistry, tenant_paths
+
+# Shared code (arca_common) lives at the project root
+_PROJECT_ROOT = str(Path(__file__).resolve().parent.parent)
+if _PROJECT_ROOT not in sys.path:
+    sys.path.append(_PROJECT_ROOT)
+from arca_common.serialization import dumps_json  # noqa: E402
+
+
+logger = logging.getLogger("AuditorAgent.chat_backend")
+
+
+# -------------------------------------------------------------------
+# Config
+# -------------------------------------------------------------------
+
+CHAT_TOP_K = 3  # passages cited per answer
+ANSWER_MAX_SENTENCES = 3
+FOLLOW_UP_SIMILARITY = 0.92  # re-use a previous retrieval above this cosine
+SESSION_CACHE_SIZE = 64  # cached questions / embeddings per session
+MAX_SESSIONS = 256
+TOKEN_DELAY_S = 0.0  # optional pacing of streamed tokens
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+# -------------------------------------------------------------------
+# Session cache
+# -------------------------------------------------------------------
+
+class _LRU(OrderedDict):
+    def __init__(self, max_size: int) -> None:
+        super().__init__()
+        self.max_size = max_size
+
+    def get_recent(self, key: Any) -> Any:
+        value = self.get(key)
+        if value is not None:
+            self.move_to_end(key)
+        return value
+
+    def put(self, key: Any, value: Any) -> None:
+        self[key] = value
+        self.move_to_end(key)
+        while len(self) > self.max_size:
+            self.popitem(last=False)
+
+
+@dataclass
+class ChatSession:
+    session_id: str
+    tenant_id: str = DEFAULT_TENANT
+    query_embeddings: _LRU = field(default_factory=lambda: _LRU(SESSION_CACHE_SIZE))
+    retrievals: _LRU = field(default_factory=lambda: _LRU(SESSION_CACHE_SIZE))
+    index_generation: int = 0  # TenantIndex.generation the caches were filled from
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class SessionStore:
+    def __init__(self, max_sessions: int = MAX_SESSIONS) -> None:
+        self._sessions = _LRU(max_sessions)
+        self._lock = threading.Lock()
+
+    def get(self, session_id: Optional[str], tenant_id: str = DEFAULT_TENANT) -> ChatSession:
+        with self._lock:
+            session = self._sessions.get_recent(session_id) if session_id else None
+            if session is None or session.tenant_id != tenant_id:
+                session = ChatSession(session_id=session_id or uuid.uuid4().hex, tenant_id=tenant_id)
+                self._sessions.put(session.session_id, session)
+            return session
+
+
+# -------------------------------------------------------------------
+# Retrieval with session caching
+# -------------------------------------------------------------------
+
+def _normalize_question(question: str) -> str:
+    return " ".join(question.casefold().split())
+
+
+def _query_embedding(session: ChatSession, model_name: str, question: str) -> np.ndarray:
+    key = (model_name, _normalize_question(question))
+    emb = session.query_embeddings.get_recent(key)
+    if emb is None:
+        emb = encode(model_name, [question])[0]
+        session.query_embeddings.put(key, emb)
+    return emb
+
+
+def _cached_follow_up(session: ChatSession, model_name: str, query_emb: np.ndarray) -> Optional[List[Dict[str, Any]]]:
+    """
+    Returns the passages of a previous, near-identical question, if any.
+    """
+    for (cached_model, _), (cached_emb, passages) in reversed(list(session.retrievals.items())):
+        if cached_model == model_name and float(cached_emb @ query_emb) >= FOLLOW_UP_SIMILARITY:
+            return passages
+    return None
+
+
+def retrieve(session: ChatSession, index: TenantIndex, question: str, top_k: int = CHAT_TOP_K) -> List[Dict[str, Any]]:
+    """
+    Top passages for question. Only the question is encoded (once per
+    session and model); a near-duplicate follow-up question skips retrieval
+    entirely.
+    """
+    if session.index_generation != index.generation:
+        # the index was rebuilt: cached passages may be gone or changed
+        session.query_embeddings.clear()
+        session.retrievals.clear()
+        session.index_generation = index.generation
+
+    model_name = model_name_for_language(detect_language(question))
+    query_emb = _query_embedding(session, model_name, question)
+
+    cached = _cached_follow_up(session, model_name, query_emb)
+    if cached is not None:
+        logger.info(f"Session {session.session_id}: re-using cached passages")
+        return cached
+
+    results = index.retriever.search(
+        question,
+        top_k=top_k,
+        encode_query=lambda model, query: _query_embedding(session, model, query),
+    )
+    passages = [
+        {
+            "citation": rank,
+            "file": r["file"],
+            "excerpt": r["excerpt"],
+            "score": round(r["embedding_score"], 4),
+        }
+        for rank, r in enumerate(results, start=1)
+    ]
+    session.retrievals.put((model_name, _normalize_question(question)), (query_emb, passages))
+    return passages
+
+
+# -------------------------------------------------------------------
+# Extractive answer
+# -------------------------------------------------------------------
+
+def extractive_answer(
+    question: str,
+    passages: List[Dict[str, Any]],
+    idf: Callable[[str], float],
+    max_sentences: int = ANSWER_MAX_SENTENCES,
+) -> str:
+    """
+    Picks the passage sentences sharing the most informative terms with the
+    question (sum of the BM25 idf of shared terms, ties broken by passage
+    rank) and cites them as [n].
+    """
+    query_terms = set(index_terms(question))
+    candidates: List[Tuple[float, int, int, str]] = []
+    for p in passages:
+        for position, sentence in enumerate(s.strip() for s in _SENTENCE_RE.split(p["excerpt"])):
+            if not sentence:
+                continue
+            overlap = sum(idf(term) for term in query_terms & set(index_terms(sentence)))
+            candidates.append((overlap, p["citation"], position, sentence))
+
+    if not candidates or max(c[0] for c in candidates) == 0:
+        if not passages:
+            return "I could not find any internal policy related to this question."
+        top = passages[0]
+        return f"The closest policy is {top['file']}: {top['excerpt'].strip()} [{top['citation']}]"
+
+    chosen = sorted(candidates, key=lambda c: (-c[0], c[1], c[2]))[:max_sentences]
+    chosen.sort(key=lambda c: (c[1], c[2]))  # keep document order in the answer
+    return " ".join(f"{sentence} [{citation}]" for _, citation, _, sentence in chosen)
+
+
+def answer_events(
+    registry: TenantRegistry,
+    session: ChatSession,
+    question: str,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yields the chat events for one question: "session", one "passage" per
+    cited passage, one "token" per answer word, then "done".
+    """
+    yield {"type": "session", "session": session.session_id}
+
+    with session.lock:
+        index = registry.get(session.tenant_id)
+        passages = retrieve(session, index, question)
+
+    for p in passages:
+        yield {"type": "passage", **p}
+
+    answer = extractive_answer(question, passages, index.bm25.idf)
+    for word in answer.split(" "):
+        yield {"type": "token", "text": word + " "}
+        if TOKEN_DELAY_S:
+            time.sleep(TOKEN_DELAY_S)
+
+    yield {"type": "done", "answer": answer, "citations": [p["file"] for p in passages]}
+
+
+# -------------------------------------------------------------------
+# HTTP / SSE endpoint
+# -------------------------------------------------------------------
+
+REGISTRY = TenantRegistry()
+SESSIONS = SessionStore()
+
+
+class ChatHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        if url.path != "/api/chat/stream":
+            self.send_error(404)
+            return
+
+        params = parse_qs(url.query)
+        question = params.get("q", [""])[0].strip()
+        if not question:
+            self.send_error(400, "Missing q parameter")
+            return
+        tenant_id = params.get("tenant", [DEFAULT_TENANT])[0]
+        try:
+            tenant_paths(tenant_id)
+        except ValueError as e:
+            self.send_error(400, str(e))
+            return
+        session = SESSIONS.get(params.get("session", [None])[0], tenant_id)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+
+        try:
+            for event in answer_events(REGISTRY, session, question):
+                self.wfile.write(b"data: " + dumps_json(event, pretty=False) + b"\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            logger.info(f"Client closed the stream (session {session.session_id})")
+        except Exception as e:
+            logger.exception("Chat request failed")
+            error = {"type": "error", "message": str(e)}
+            self.wfile.write(b"data: " + dumps_json(error, pretty=False) + b"\n\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ARCA chat backend (SSE)")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), ChatHandler)
+    logger.info(f"Chat backend listening on http://127.0.0.1:{args.port}/api/chat/stream")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
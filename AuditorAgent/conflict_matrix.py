@@ -0,0 +1,247 @@
+"""
+Policy-policy conflict matrix for the AuditorAgent
+
+- Computes the self-similarity of the chunked policies/ corpus in blocks
+  (X[i:i+B] @ X[j:j+B].T) so only one B x B block is in memory at a time
+- Keeps, for every chunk, its top-k most similar chunks of OTHER policies
+  above a threshold (sparse result, k entries per chunk)
+- Writes the pairs in the auditor risk schema so generator_agent can report them
+
+Memory: embeddings (N x d float32) + one block (B x B float32) + top-k tables
+(N x k). With N = 100k, d = 384, k = 10 and the default budget this stays
+well under 1 GB.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import math
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from corpus import PolicyChunk, load_policy_chunks
+from severity import CATEGORY_THRESHOLDS, DEFAULT_THRESHOLDS, apply_severity
+
+# Shared code (arca_common) lives at the project root
+_PROJECT_ROOT = str(Path(__file__).resolve().parent.parent)
+if _PROJECT_ROOT not in sys.path:
+    sys.path.append(_PROJECT_ROOT)
+from arca_common.serialization import write_atomic  # noqa: E402
+
+
+logger = logging.getLogger("AuditorAgent.conflict_matrix")
+
+
+# -------------------------------------------------------------------
+# Config
+# -------------------------------------------------------------------
+
+BASE_DIR = Path(__file__).resolve().parent
+POLICY_CONFLICTS_PATH = BASE_DIR / "outputs" / "policy_conflicts.json"
+
+# Pairs below this score are dropped: the lowest MEDIUM threshold of any
+# category, so no pair that apply_severity would flag is lost
+CONFLICT_THRESHOLD = min([DEFAULT_THRESHOLDS[0]] + [medium for medium, _ in CATEGORY_THRESHOLDS.values()])
+CONFLICT_TOP_K = 10  # neighbours kept per chunk
+BLOCK_MEMORY_MB = 64  # budget for one similarity block
+
+
+def block_size_for_budget(memory_mb: float = BLOCK_MEMORY_MB) -> int:
+    """
+    Largest block size B such that one B x B block fits in memory_mb, counting
+    its temporaries: scores and negated scores (float32), argpartition
+    indices (int64) and the boolean masks, about 20 bytes per entry.
+    """
+    budget_bytes = memory_mb * 1024 * 1024
+    return max(1, int(math.sqrt(budget_bytes / 20)))
+
+
+# -------------------------------------------------------------------
+# Blocked top-k self-similarity
+# -------------------------------------------------------------------
+
+def _merge_top_k(
+    top_scores: np.ndarray,
+    top_idx: np.ndarray,
+    rows: slice,
+    block: np.ndarray,
+    col_offset: int,
+) -> None:
+    """
+    Merges the candidates of block (rows x block columns) into the running
+    top-k tables of those rows, in place.
+    """
+    k = top_scores.shape[1]
+    n_cols = block.shape[1]
+    take = min(k, n_cols)
+
+    # Best `take` candidates of the block for each row
+    part = np.argpartition(-block, take - 1, axis=1)[:, :take]
+    cand_scores = np.take_along_axis(block, part, axis=1)
+    cand_idx = (part + col_offset).astype(np.int32)
+
+    merged_scores = np.concatenate([top_scores[rows], cand_scores], axis=1)
+    merged_idx = np.concatenate([top_idx[rows], cand_idx], axis=1)
+    best = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+    top_scores[rows] = np.take_along_axis(merged_scores, best, axis=1)
+    top_idx[rows] = np.take_along_axis(merged_idx, best, axis=1)
+
+
+def blocked_top_k(
+    embeddings: np.ndarray,
+    groups: np.ndarray,
+    k: int = CONFLICT_TOP_K,
+    threshold: float = CONFLICT_THRESHOLD,
+    block_size: int = 0,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    For every row of embeddings (L2-normalized), finds the k most similar rows
+    whose group (policy) differs, keeping only scores >= threshold.
+
+    Only the upper triangle of blocks is computed; each block updates the
+    top-k of its rows and, transposed, of its columns.
+    Returns (top_scores, top_idx) of shape (N, k); empty slots have idx -1.
+    """
+    n = embeddings.shape[0]
+    block_size = block_size or block_size_for_budget()
+    top_scores = np.full((n, k), -np.inf, dtype=np.float32)
+    top_idx = np.full((n, k), -1, dtype=np.int32)
+
+    for i in range(0, n, block_size):
+        rows = slice(i, min(i + block_size, n))
+        x_i = embeddings[rows]
+        for j in range(i, n, block_size):
+            cols = slice(j, min(j + block_size, n))
+            block = (x_i @ embeddings[cols].T).astype(np.float32, copy=False)
+
+            # drop pairs of the same policy (incl. self pairs) and weak pairs
+            same_group = groups[rows, None] == groups[None, cols]
+            block[same_group | (block < threshold)] = -np.inf
+
+            _merge_top_k(top_scores, top_idx, rows, block, col_offset=j)
+            if j != i:
+                _merge_top_k(top_scores, top_idx, cols, block.T, col_offset=i)
+
+        logger.info(f"Conflict matrix: rows {rows.start}-{rows.stop} of {n} done")
+
+    top_idx[~np.isfinite(top_scores)] = -1
+    return top_scores, top_idx
+
+
+def top_k_pairs(top_scores: np.ndarray, top_idx: np.ndarray) -> List[Tuple[int, int, float]]:
+    """
+    Converts the top-k tables to unique (i, j, score) pairs with i < j,
+    sorted by decreasing score.
+    """
+    pairs: Dict[Tuple[int, int], float] = {}
+    rows, slots = np.nonzero(top_idx >= 0)
+    for row, slot in zip(rows.tolist(), slots.tolist()):
+        col = int(top_idx[row, slot])
+        key = (min(row, col), max(row, col))
+        pairs[key] = float(top_scores[row, slot])
+    return sorted(((i, j, s) for (i, j), s in pairs.items()), key=lambda p: p[2], reverse=True)
+
+
+# -------------------------------------------------------------------
+# Risk schema output
+# -------------------------------------------------------------------
+
+def pairs_to_risks(
+    pairs: Sequence[Tuple[int, int, float]],
+    chunks: Sequence[PolicyChunk],
+    chunk_ids: Sequence[int],
+) -> List[Dict[str, Any]]:
+    """
+    Builds one auditor-style risk per pair. Row positions are mapped back to
+    chunks through chunk_ids (row r is chunk chunk_ids[r]).
+    """
+    risks: List[Dict[str, Any]] = []
+    for i, j, score in pairs:
+        first, second = chunks[chunk_ids[i]], chunks[chunk_ids[j]]
+        risks.append({
+            "policy_id": first.policy_id,
+            "severity": None,  # set by apply_severity below
+            "divergence_summary": (
+                f"Overlapping internal policy: {second.policy_id} "
+                f"(similarity {score:.2f}); check the two texts for contradictions"
+            ),
+            "conflicting_policy_excerpt": first.text,
+            "new_rule_excerpt": second.text,
+            "related_policy_id": second.policy_id,
+            "similarity": round(score, 4),
+            "recommendation": "Align or merge the two internal policies if they contradict",
+        })
+    apply_severity(risks, summaries=False)
+    return risks
+
+
+def save_policy_conflicts(risks: List[Dict[str, Any]], path: Path = POLICY_CONFLICTS_PATH) -> None:
+    write_atomic(path, risks)
+    logger.info(f"Policy conflicts saved to: {path} ({len(risks)} pairs)")
+
+
+# -------------------------------------------------------------------
+# Main entrypoint (python conflict_matrix.py)
+# -------------------------------------------------------------------
+
+def compute_policy_conflicts(
+    chunks: Sequence[PolicyChunk],
+    indexes: Dict[str, Any],
+    k: int = CONFLICT_TOP_K,
+    threshold: float = CONFLICT_THRESHOLD,
+    block_size: int = 0,
+) -> List[Dict[str, Any]]:
+    """
+    Runs the blocked self-similarity on each per-model EmbeddingIndex
+    (scores of different models are not comparable, so they are not mixed).
+    """
+    policy_codes: Dict[str, int] = {}
+    risks: List[Dict[str, Any]] = []
+
+    for model_name, index in indexes.items():
+        if len(index.chunk_ids) < 2:
+            continue
+        groups = np.asarray(
+            [policy_codes.setdefault(chunks[c].policy_id, len(policy_codes)) for c in index.chunk_ids],
+            dtype=np.int32,
+        )
+        logger.info(f"Computing conflict matrix for '{model_name}' ({len(index.chunk_ids)} chunks)")
+        top_scores, top_idx = blocked_top_k(index.matrix, groups, k=k, threshold=threshold, block_size=block_size)
+        risks.extend(pairs_to_risks(top_k_pairs(top_scores, top_idx), chunks, index.chunk_ids))
+
+    risks.sort(key=lambda r: r["similarity"], reverse=True)
+    return risks
+
+
+def main() -> None:
+    from embeddings import build_indexes
+    from tenants import DEFAULT_TENANT, tenant_paths
+
+    parser = argparse.ArgumentParser(description="Policy-policy conflict matrix")
+    parser.add_argument("--top-k", type=int, default=CONFLICT_TOP_K)
+    parser.add_argument("--threshold", type=float, default=CONFLICT_THRESHOLD)
+    parser.add_argument("--memory-mb", type=float, default=BLOCK_MEMORY_MB)
+    parser.add_argument("--tenant", default=DEFAULT_TENANT)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+
+    paths = tenant_paths(args.tenant)
+    chunks = load_policy_chunks(paths.policies_dir)
+    indexes = build_indexes(chunks, cache_dir=paths.embeddings_dir)
+    risks = compute_policy_conflicts(
+        chunks,
+        indexes,
+        k=args.top_k,
+        threshold=args.threshold,
+        block_size=block_size_for_budget(args.memory_mb),
+    )
+    save_policy_conflicts(risks, paths.policy_conflicts)
+
+
+if __name__ == "__main__":
+    main()
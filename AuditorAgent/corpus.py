@@ -0,0 +1,187 @@
+"""
+Policy corpus helpers for the AuditorAgent
+
+- Reads the internal policies from policies/*.txt
+- Normalizes the text and splits it into small chunks (groups of lines)
+- Provides the tokenizer shared by the lexical index, and the normalized
+  index terms (no stopwords, plurals folded) that BM25 is built on
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+import unicodedata
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Collection, Iterable, List, Optional
+
+
+logger = logging.getLogger("AuditorAgent.corpus")
+
+
+# -------------------------------------------------------------------
+# Paths configuration (relative to this file)
+# -------------------------------------------------------------------
+
+BASE_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = BASE_DIR.parent
+
+POLICIES_DIR = PROJECT_ROOT / "policies"
+
+# Max number of words per chunk (policies are short, one rule per line)
+CHUNK_MAX_WORDS = 60
+
+
+# -------------------------------------------------------------------
+# Data model for a single chunk of a policy file
+# -------------------------------------------------------------------
+
+@dataclass
+class PolicyChunk:
+    chunk_id: int
+    policy_id: str
+    text: str
+
+
+# -------------------------------------------------------------------
+# Normalization and tokenization
+# -------------------------------------------------------------------
+
+# Words, numbers and hyphenated compounds ("two-factor", "90", "foncière")
+_TOKEN_RE = re.compile(r"\w+(?:-\w+)*", re.UNICODE)
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalizes unicode (NFC), line endings and trailing spaces of a policy text.
+    """
+    text = unicodedata.normalize("NFC", text)
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return "\n".join(line.strip() for line in text.split("\n"))
+
+
+def text_hash(text: str) -> str:
+    """
+    Short deterministic hash of a normalized text (whitespace-insensitive).
+    """
+    normalized = " ".join(normalize_text(text).split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase tokenizer (base of the BM25 index terms and of the dedup shingles).
+    Hyphenated compounds are kept as one token AND split into their parts,
+    so "two-factor" matches both "two-factor" and "two factor".
+    """
+    tokens: List[str] = []
+    for match in _TOKEN_RE.finditer(text.casefold()):
+        token = match.group(0)
+        tokens.append(token)
+        if "-" in token:
+            tokens.extend(part for part in token.split("-") if part)
+    return tokens
+
+
+# Function words of the policy languages: they match almost every chunk, so
+# a query made mostly of them would pick candidates at random
+_STOPWORDS = frozenset({
+    # English
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "with", "by",
+    "at", "as", "from", "is", "are", "be", "been", "was", "were", "it", "its",
+    "this", "that", "these", "those", "all", "any", "each", "must", "should",
+    "shall", "may", "will", "can",
+    # French
+    "le", "la", "les", "l", "de", "des", "du", "d", "un", "une", "et", "ou",
+    "à", "au", "aux", "en", "pour", "par", "sur", "dans", "avec", "est",
+    "sont", "être", "doit", "doivent", "ce", "cette", "ces", "qui", "que",
+    "se", "sa", "son", "ses", "leur", "leurs", "tout", "tous", "toute", "toutes",
+})
+
+
+def _fold_plural(token: str) -> str:
+    # light English/French plural folding: "passwords" -> "password",
+    # "policies" -> "policy", "réseaux" -> "réseau"; "access", "status",
+    # "analysis" and numbers are left alone
+    if len(token) <= 3 or not token.isalpha():
+        return token
+    if token.endswith("ies") and len(token) > 4:
+        return token[:-3] + "y"
+    if token.endswith("eaux"):
+        return token[:-1]
+    if token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def index_terms(text: str) -> List[str]:
+    """
+    Terms indexed and searched by BM25: the tokens of text without stopwords,
+    with plurals folded, so "Passwords" in a policy matches "password" in a
+    query (and the other way round).
+    """
+    return [_fold_plural(token) for token in tokenize(text) if token not in _STOPWORDS]
+
+
+# -------------------------------------------------------------------
+# Chunking
+# -------------------------------------------------------------------
+
+def chunk_text(text: str, max_words: int = CHUNK_MAX_WORDS) -> List[str]:
+    """
+    Splits a policy text into chunks of whole lines, each of at most max_words
+    words (a single longer line becomes its own chunk).
+    """
+    chunks: List[str] = []
+    current: List[str] = []
+    current_words = 0
+
+    for line in normalize_text(text).split("\n"):
+        if not line:
+            continue
+        n_words = len(line.split())
+        if current and current_words + n_words > max_words:
+            chunks.append("\n".join(current))
+            current, current_words = [], 0
+        current.append(line)
+        current_words += n_words
+
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def iter_policy_files(policies_dir: Path = POLICIES_DIR) -> Iterable[Path]:
+    """
+    Yields the policy .txt files in a stable (sorted) order.
+    """
+    return sorted(p for p in policies_dir.glob("*.txt") if p.is_file())
+
+
+def load_policy_chunks(
+    policies_dir: Path = POLICIES_DIR,
+    max_words: int = CHUNK_MAX_WORDS,
+    exclude: Collection[str] = (),
+    include: Optional[Collection[str]] = None,
+) -> List[PolicyChunk]:
+    """
+    Loads every policy in policies_dir and returns the list of its chunks.
+    Policy files named in exclude (e.g. near-duplicates) are skipped; if
+    include is given, only the policy files it names are loaded.
+    chunk_id is the position of the chunk in the returned list.
+    """
+    if not policies_dir.exists():
+        raise FileNotFoundError(f"Policies folder not found at: {policies_dir}")
+
+    chunks: List[PolicyChunk] = []
+    for path in iter_policy_files(policies_dir):
+        if path.name in exclude or (include is not None and path.name not in include):
+            continue
+        text = path.read_text(encoding="utf-8", errors="replace")
+        for piece in chunk_text(text, max_words=max_words):
+            chunks.append(PolicyChunk(chunk_id=len(chunks), policy_id=path.name, text=piece))
+
+    logger.info(f"Loaded {len(chunks)} chunks from {policies_dir}")
+    return chunks
@@ -0,0 +1,199 @@
+"""
+Near-duplicate policy detection (MinHash + LSH) for the AuditorAgent
+
+- Each policy is turned into a set of word shingles
+- MinHash signatures estimate the Jaccard similarity between policies
+- LSH banding only compares policies that share at least one band bucket
+- Near-identical policies are grouped; only one representative per group is
+  audited, and the GeneratorAgent fans the risks back out to the members
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Set
+
+import numpy as np
+
+from corpus import POLICIES_DIR, iter_policy_files, normalize_text, tokenize
+
+# Shared code (arca_common) lives at the project root
+_PROJECT_ROOT = str(Path(__file__).resolve().parent.parent)
+if _PROJECT_ROOT not in sys.path:
+    sys.path.append(_PROJECT_ROOT)
+from arca_common.serialization import write_atomic  # noqa: E402
+
+
+logger = logging.getLogger("AuditorAgent.dedup")
+
+
+# -------------------------------------------------------------------
+# Config
+# -------------------------------------------------------------------
+
+BASE_DIR = Path(__file__).resolve().parent
+POLICY_GROUPS_PATH = BASE_DIR / "outputs" / "policy_groups.json"
+
+SHINGLE_SIZE = 3  # words per shingle
+NUM_PERM = 128  # MinHash signature length
+LSH_BANDS = 16  # NUM_PERM must be divisible by LSH_BANDS
+DEDUP_THRESHOLD = 0.8  # minimum estimated Jaccard to group two policies
+
+_MERSENNE_PRIME = np.uint64((1 << 31) - 1)  # a * x stays below 2**62, no overflow
+_SEED = 1
+
+
+# -------------------------------------------------------------------
+# Shingles and MinHash signatures
+# -------------------------------------------------------------------
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[str]:
+    """
+    Returns the set of word shingles of a text (the whole text if it is shorter).
+    """
+    tokens = tokenize(normalize_text(text))
+    if len(tokens) <= size:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def _hash_shingles(items: Set[str]) -> np.ndarray:
+    hashed = [
+        int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+        for s in items
+    ]
+    return np.asarray(hashed, dtype=np.uint64) % _MERSENNE_PRIME
+
+
+class MinHasher:
+    """
+    Computes MinHash signatures with NUM_PERM universal hash functions
+    h(x) = (a * x + b) mod p, all evaluated at once with NumPy.
+    """
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = _SEED) -> None:
+        rng = np.random.default_rng(seed)
+        p = int(_MERSENNE_PRIME)
+        self.num_perm = num_perm
+        self.a = rng.integers(1, p, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, p, size=num_perm, dtype=np.uint64)
+
+    def signature(self, items: Set[str]) -> np.ndarray:
+        if not items:
+            return np.full(self.num_perm, int(_MERSENNE_PRIME), dtype=np.uint64)
+        x = _hash_shingles(items)
+        values = (np.outer(x, self.a) + self.b) % _MERSENNE_PRIME
+        return values.min(axis=0)
+
+
+def estimated_jaccard(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+    return float(np.mean(sig_a == sig_b))
+
+
+# -------------------------------------------------------------------
+# LSH grouping
+# -------------------------------------------------------------------
+
+def find_duplicate_groups(
+    texts: Dict[str, str],
+    threshold: float = DEDUP_THRESHOLD,
+    bands: int = LSH_BANDS,
+    num_perm: int = NUM_PERM,
+) -> Dict[str, List[str]]:
+    """
+    Groups near-identical texts (estimated Jaccard >= threshold).
+
+    texts maps policy_id -> text. Returns representative -> sorted members
+    (the representative included) for every group of two or more policies.
+    The representative is the first policy_id in sorted order.
+    """
+    if num_perm % bands:
+        raise ValueError("num_perm must be divisible by bands.")
+    rows = num_perm // bands
+
+    hasher = MinHasher(num_perm=num_perm)
+    ids = sorted(texts)
+    signatures = {pid: hasher.signature(shingles(texts[pid])) for pid in ids}
+
+    # Candidate pairs: policies sharing a bucket in at least one band
+    buckets: Dict[tuple, List[str]] = defaultdict(list)
+    for pid in ids:
+        sig = signatures[pid]
+        for band in range(bands):
+            key = (band, sig[band * rows:(band + 1) * rows].tobytes())
+            buckets[key].append(pid)
+
+    parent = {pid: pid for pid in ids}
+
+    def find(pid: str) -> str:
+        while parent[pid] != pid:
+            parent[pid] = parent[parent[pid]]
+            pid = parent[pid]
+        return pid
+
+    checked: Set[tuple] = set()
+    for members in buckets.values():
+        for i, first in enumerate(members):
+            for second in members[i + 1:]:
+                if (first, second) in checked:
+                    continue
+                checked.add((first, second))
+                if estimated_jaccard(signatures[first], signatures[second]) >= threshold:
+                    root_a, root_b = find(first), find(second)
+                    if root_a != root_b:
+                        parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    groups: Dict[str, List[str]] = defaultdict(list)
+    for pid in ids:
+        groups[find(pid)].append(pid)
+
+    duplicates = {rep: members for rep, members in groups.items() if len(members) > 1}
+    logger.info(
+        f"Dedup: {len(ids)} policies, {len(duplicates)} near-duplicate groups, "
+        f"{sum(len(m) - 1 for m in duplicates.values())} policies skipped"
+    )
+    return duplicates
+
+
+def find_policy_duplicates(
+    policies_dir: Path = POLICIES_DIR,
+    threshold: float = DEDUP_THRESHOLD,
+) -> Dict[str, List[str]]:
+    """
+    Runs find_duplicate_groups on every policy file of policies_dir.
+    """
+    texts = {
+        path.name: path.read_text(encoding="utf-8", errors="replace")
+        for path in iter_policy_files(policies_dir)
+    }
+    return find_duplicate_groups(texts, threshold=threshold)
+
+
+def non_representatives(groups: Dict[str, List[str]]) -> Set[str]:
+    """
+    Returns the policy_ids that are covered by another policy of their group.
+    """
+    return {pid for rep, members in groups.items() for pid in members if pid != rep}
+
+
+# -------------------------------------------------------------------
+# Save groups (read by the GeneratorAgent)
+# -------------------------------------------------------------------
+
+def save_policy_groups(groups: Dict[str, List[str]], path: Path = POLICY_GROUPS_PATH) -> None:
+    """
+    Saves the groups as {"groups": [{"representative": str, "members": [str, ...]}]}.
+    """
+    payload = {
+        "groups": [
+            {"representative": rep, "members": members}
+            for rep, members in sorted(groups.items())
+        ]
+    }
+    write_atomic(path, payload)
+    logger.info(f"Policy groups saved to: {path}")
+
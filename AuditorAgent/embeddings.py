@@ -0,0 +1,303 @@
+"""
+Embedding model registry for the AuditorAgent
+
+- Several sentence-transformers models can be used side by side
+  (the English all-MiniLM-L6-v2 and a multilingual model for French/Arabic)
+- A light language detection routes each text to the right model
+- Each model is loaded once per process and shared by every caller
+- Embeddings of different models are kept in separate indexes
+  (retrieval.HybridRetriever searches them)
+- Indexes reuse the embeddings already computed by ingestion (shards keyed
+  by chunk text hash) instead of encoding those chunks again
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import zipfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Collection, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from corpus import PolicyChunk, text_hash
+
+
+logger = logging.getLogger("AuditorAgent.embeddings")
+
+
+# -------------------------------------------------------------------
+# Registry configuration
+# -------------------------------------------------------------------
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+MULTILINGUAL_MODEL = "paraphrase-multilingual-MiniLM-L12-v2"
+
+# language code -> model name (unknown languages use the multilingual model)
+LANGUAGE_MODELS: Dict[str, str] = {
+    "en": DEFAULT_MODEL,
+    "fr": MULTILINGUAL_MODEL,
+    "ar": MULTILINGUAL_MODEL,
+}
+
+ENCODE_BATCH_SIZE = 64
+
+# Loaded models, keyed by model name (one instance per process)
+_MODELS: Dict[str, Any] = {}
+
+
+# -------------------------------------------------------------------
+# Language detection
+# -------------------------------------------------------------------
+
+_ARABIC_RE = re.compile("[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF]")
+_LETTER_RE = re.compile(r"[^\W\d_]", re.UNICODE)
+_WORD_RE = re.compile(r"[^\W\d_]+", re.UNICODE)
+
+_FRENCH_WORDS = {
+    "le", "la", "les", "des", "du", "un", "une", "et", "est", "sont", "doit",
+    "doivent", "pour", "dans", "avec", "sur", "par", "au", "aux", "ne", "pas",
+    "que", "qui", "ce", "cette", "tout", "tous", "être", "employés", "données",
+}
+_ENGLISH_WORDS = {
+    "the", "and", "must", "be", "of", "to", "for", "with", "all", "is", "are",
+    "in", "on", "by", "not", "should", "any", "or", "only", "employees",
+}
+
+
+def detect_language(text: str) -> str:
+    """
+    Returns "ar", "fr" or "en" for a text.
+    Arabic is detected by script; French vs English by common function words.
+    A few French words inside an English policy (e.g. "conservation foncière")
+    are not enough to switch language.
+    """
+    letters = _LETTER_RE.findall(text)
+    if letters and len(_ARABIC_RE.findall(text)) / len(letters) > 0.3:
+        return "ar"
+
+    words = [w.casefold() for w in _WORD_RE.findall(text)]
+    french_hits = sum(w in _FRENCH_WORDS for w in words)
+    english_hits = sum(w in _ENGLISH_WORDS for w in words)
+    if french_hits > english_hits:
+        return "fr"
+    return "en"
+
+
+# -------------------------------------------------------------------
+# Shared model loading
+# -------------------------------------------------------------------
+
+def get_model(model_name: str = DEFAULT_MODEL) -> Any:
+    """
+    Returns the SentenceTransformer for model_name, loading it on first use only.
+    """
+    model = _MODELS.get(model_name)
+    if model is None:
+        from sentence_transformers import SentenceTransformer
+
+        logger.info(f"Loading embedding model: {model_name}")
+        model = SentenceTransformer(model_name)
+        _MODELS[model_name] = model
+    return model
+
+
+def model_name_for_language(language: str) -> str:
+    return LANGUAGE_MODELS.get(language, MULTILINGUAL_MODEL)
+
+
+def pair_model_name(language_a: str, language_b: str) -> str:
+    """
+    Model able to compare a text in language_a with one in language_b: the
+    language's own model when they match, the multilingual model otherwise
+    (the English model does not embed French or Arabic meaningfully).
+    """
+    if language_a == language_b:
+        return model_name_for_language(language_a)
+    return MULTILINGUAL_MODEL
+
+
+def model_for_text(text: str) -> Any:
+    """
+    Returns the shared model matching the detected language of text.
+    """
+    return get_model(model_name_for_language(detect_language(text)))
+
+
+def encode(model_name: str, texts: Sequence[str]) -> np.ndarray:
+    """
+    Encodes texts with the shared model_name, as L2-normalized float32 rows.
+    """
+    model = get_model(model_name)
+    embeddings = model.encode(
+        list(texts),
+        batch_size=ENCODE_BATCH_SIZE,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+    )
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+# -------------------------------------------------------------------
+# Per-model embedding indexes
+# -------------------------------------------------------------------
+
+@dataclass
+class EmbeddingIndex:
+    """
+    Embeddings of the chunks routed to one model.
+    Row i of matrix is the embedding of chunk chunk_ids[i].
+    """
+    model_name: str
+    chunk_ids: List[int] = field(default_factory=list)
+    matrix: np.ndarray = field(default_factory=lambda: np.zeros((0, 0), dtype=np.float32))
+
+    def __post_init__(self) -> None:
+        self._rows: Dict[int, int] = {chunk_id: row for row, chunk_id in enumerate(self.chunk_ids)}
+
+    def __contains__(self, chunk_id: int) -> bool:
+        return chunk_id in self._rows
+
+    def rows(self, chunk_ids: Sequence[int]) -> np.ndarray:
+        """
+        Row of matrix of each chunk id (all must be in the index).
+        """
+        return np.fromiter((self._rows[c] for c in chunk_ids), dtype=np.int64, count=len(chunk_ids))
+
+    def add(self, chunk_ids: Sequence[int], matrix: np.ndarray) -> None:
+        """
+        Appends the embeddings of new chunks (row i of matrix is chunk_ids[i]).
+        """
+        for chunk_id in chunk_ids:
+            self._rows[chunk_id] = len(self.chunk_ids)
+            self.chunk_ids.append(chunk_id)
+        self.matrix = matrix if not self.matrix.size else np.vstack([self.matrix, matrix])
+
+    def search(self, query_emb: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+        """
+        Returns up to top_k (chunk_id, cosine) pairs, best first.
+        """
+        if not self.chunk_ids:
+            return []
+        scores = self.matrix @ query_emb
+        k = min(top_k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [(self.chunk_ids[i], float(scores[i])) for i in best]
+
+
+def save_embedding_shard(path: Path, matrix: np.ndarray, text_hashes: Sequence[str], policy_ids: Sequence[str]) -> None:
+    """
+    Writes one embedding shard (.npz) to a temp file, then renames it over
+    path, so a reader never sees a half-written shard.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")  # not matched by shard_*.npz
+    try:
+        with tmp.open("wb") as f:
+            np.savez(f, embeddings=matrix, text_hashes=np.asarray(text_hashes), policy_ids=np.asarray(policy_ids))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def _read_shard(shard: Path) -> Optional[Dict[str, np.ndarray]]:
+    # None for a shard that cannot be read (truncated, or an older format)
+    try:
+        with np.load(shard) as data:
+            if "text_hashes" not in data.files:
+                return None
+            return {name: data[name] for name in data.files}
+    except (OSError, ValueError, EOFError, zipfile.BadZipFile) as e:
+        logger.warning(f"Skipping unreadable embedding shard {shard}: {e}")
+        return None
+
+
+def load_embedding_cache(cache_dir: Optional[Path], model_name: str) -> Dict[str, np.ndarray]:
+    """
+    Embeddings saved by ingestion for model_name
+    (cache_dir/<model_name>/<upload_id>/shard_*.npz), keyed by chunk text hash.
+    Unreadable shards are skipped (their chunks are encoded again).
+    """
+    cache: Dict[str, np.ndarray] = {}
+    model_dir = cache_dir / model_name if cache_dir is not None else None
+    if model_dir is None or not model_dir.is_dir():
+        return cache
+    for shard in sorted(model_dir.glob("*/shard_*.npz")):
+        data = _read_shard(shard)
+        if data is None:
+            continue
+        for h, emb in zip(data["text_hashes"].tolist(), data["embeddings"]):
+            cache[h] = emb
+    return cache
+
+
+def prune_embedding_shards(cache_dir: Path, live_hashes: Collection[str]) -> int:
+    """
+    Drops the embeddings of chunks no longer in the corpus (e.g. replaced
+    policies): shards without any live chunk are deleted, the others are
+    rewritten with their live rows only. Returns the number of rows dropped.
+    """
+    dropped = 0
+    if not cache_dir.is_dir():
+        return dropped
+    for shard in sorted(cache_dir.glob("*/*/shard_*.npz")):
+        data = _read_shard(shard)
+        if data is None:
+            continue
+        live = np.asarray([h in live_hashes for h in data["text_hashes"].tolist()], dtype=bool)
+        if live.all():
+            continue
+        dropped += int((~live).sum())
+        if live.any():
+            save_embedding_shard(shard, data["embeddings"][live], data["text_hashes"][live], data["policy_ids"][live])
+        else:
+            shard.unlink()
+            if not any(shard.parent.iterdir()):
+                shard.parent.rmdir()
+    return dropped
+
+
+def encode_cached(model_name: str, texts: Sequence[str], cache: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Like encode, but texts whose hash is in cache are not encoded again.
+    """
+    hashes = [text_hash(t) for t in texts]
+    missing = [i for i, h in enumerate(hashes) if h not in cache]
+    if missing:
+        for i, emb in zip(missing, encode(model_name, [texts[i] for i in missing])):
+            cache[hashes[i]] = emb
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.stack([cache[h] for h in hashes]).astype(np.float32, copy=False)
+
+
+def build_indexes(chunks: Sequence[PolicyChunk], cache_dir: Optional[Path] = None) -> Dict[str, EmbeddingIndex]:
+    """
+    Routes every chunk to the model of its language and encodes each group in
+    batch (reusing the ingestion shards of cache_dir, if given).
+    Returns one EmbeddingIndex per model name that received chunks.
+    """
+    groups: Dict[str, List[PolicyChunk]] = {}
+    for chunk in chunks:
+        model_name = model_name_for_language(detect_language(chunk.text))
+        groups.setdefault(model_name, []).append(chunk)
+
+    indexes: Dict[str, EmbeddingIndex] = {}
+    for model_name, group in groups.items():
+        cache = load_embedding_cache(cache_dir, model_name)
+        cached = sum(text_hash(c.text) in cache for c in group)
+        matrix = encode_cached(model_name, [c.text for c in group], cache)
+        indexes[model_name] = EmbeddingIndex(
+            model_name=model_name,
+            chunk_ids=[c.chunk_id for c in group],
+            matrix=matrix,
+        )
+        logger.info(f"Index '{model_name}': {len(group)} chunks ({cached} from ingestion shards)")
+    return indexes
@@ -0,0 +1,398 @@
+"""
+Bulk policy ingestion for ARCA (backend of the PoliciesUpload page)
+
+- Accepts zip archives, folders or single files
+- Reads each document as a stream, detects its encoding and decodes it
+  incrementally, then normalizes and chunks it (same rules as corpus.py)
+- Saves the normalized text into the tenant's policies/ (so BM25 / dedup see
+  it); a name already used in the upload, or by an existing policy, is
+  rejected unless replacing is asked for
+- Hands the chunks to the embedding stage in fixed-size batches through a
+  worker pool; the number of batches in flight is bounded, so a 10k-document
+  upload never sits in memory as a whole
+- Embeddings are saved as shards under the tenant's embeddings folder, one
+  sub-folder per upload, keyed by chunk text hash: the retrieval indexes
+  reuse them instead of encoding the chunks again (embeddings.build_indexes).
+  Shards are written atomically; the embeddings of replaced policies are
+  pruned once the upload is done.
+  Loaded tenant indexes see the new policies/ content and are rebuilt
+  (tenants.TenantRegistry)
+
+Run:
+    python ingestion.py uploads/policies.zip [--tenant acme] [--replace]
+    python ingestion.py --serve --port 8765       # POST /api/policies/upload?tenant=acme
+"""
+
+from __future__ import annotations
+
+import argparse
+import codecs
+import io
+import json
+import logging
+import shutil
+import tempfile
+import threading
+import uuid
+import zipfile
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from corpus import PolicyChunk, chunk_text, load_policy_chunks, normalize_text, text_hash
+from embeddings import detect_language, encode, model_name_for_language, prune_embedding_shards, save_embedding_shard
+from tenants import DEFAULT_TENANT, tenant_paths
+
+
+logger = logging.getLogger("AuditorAgent.ingestion")
+
+
+# -------------------------------------------------------------------
+# Config
+# -------------------------------------------------------------------
+
+TEXT_EXTENSIONS = {".txt", ".md"}
+READ_BLOCK_SIZE = 64 * 1024  # bytes read per step (and used for encoding sniffing)
+INGEST_BATCH_SIZE = 256  # chunks per embedding batch
+INGEST_WORKERS = 2
+MAX_BATCHES_IN_FLIGHT = 2 * INGEST_WORKERS
+
+BatchHandler = Callable[[List[PolicyChunk]], None]
+
+
+@dataclass
+class IngestionStats:
+    upload_id: str = ""
+    documents: int = 0
+    chunks: int = 0
+    batches: int = 0
+    skipped: int = 0
+    rejected: List[str] = field(default_factory=list)  # names already taken
+    replaced: List[str] = field(default_factory=list)  # existing policies overwritten
+
+
+# -------------------------------------------------------------------
+# Encoding detection and streaming decode
+# -------------------------------------------------------------------
+
+_BOMS: Sequence[Tuple[bytes, str]] = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+def detect_encoding(sample: bytes) -> str:
+    """
+    Guesses the encoding of a document from its first bytes:
+    BOM, then strict UTF-8, then charset_normalizer (if installed), then cp1252.
+    """
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+
+    try:
+        # final=False: a multi-byte char cut at the end of the sample is fine
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+
+    try:
+        from charset_normalizer import from_bytes
+    except ImportError:
+        return "cp1252"
+
+    best = from_bytes(sample).best()
+    return best.encoding if best is not None else "cp1252"
+
+
+def iter_decoded(stream: BinaryIO, block_size: int = READ_BLOCK_SIZE) -> Iterator[str]:
+    """
+    Decodes a binary stream block by block with an incremental decoder.
+    The encoding is detected on the first block.
+    """
+    first = stream.read(block_size)
+    encoding = detect_encoding(first)
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+
+    block = first
+    while block:
+        yield decoder.decode(block)
+        block = stream.read(block_size)
+    yield decoder.decode(b"", final=True)
+
+
+def read_document(stream: BinaryIO) -> str:
+    """
+    Decodes and normalizes one document.
+    """
+    buffer = io.StringIO()
+    for piece in iter_decoded(stream):
+        buffer.write(piece)
+    return normalize_text(buffer.getvalue())
+
+
+# -------------------------------------------------------------------
+# Upload sources (zip archives, folders, files)
+# -------------------------------------------------------------------
+
+def _is_text_document(name: str) -> bool:
+    return Path(name).suffix.lower() in TEXT_EXTENSIONS and not Path(name).name.startswith(".")
+
+
+def iter_upload_documents(source: Path) -> Iterator[Tuple[str, BinaryIO]]:
+    """
+    Yields (file name, open binary stream) for every text document of source,
+    one at a time. Zip members are streamed without extracting the archive.
+    Only the base name is kept, so archive paths cannot escape policies/.
+    """
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not _is_text_document(info.filename):
+                    continue
+                with archive.open(info) as stream:
+                    yield Path(info.filename).name, stream
+    elif source.is_dir():
+        for path in sorted(source.rglob("*")):
+            if path.is_file():
+                yield from iter_upload_documents(path)
+    elif _is_text_document(source.name):
+        with source.open("rb") as stream:
+            yield source.name, stream
+    else:
+        logger.warning(f"Skipping unsupported upload: {source}")
+
+
+# -------------------------------------------------------------------
+# Embedding stage (default batch handler)
+# -------------------------------------------------------------------
+
+class EmbeddingShardWriter:
+    """
+    Encodes each batch with the embedding registry (language-routed model)
+    and saves one .npz shard per batch and model under
+    output_dir/<model>/<upload_id>/, so two uploads never share a file.
+    """
+
+    def __init__(self, output_dir: Path, upload_id: Optional[str] = None) -> None:
+        self.output_dir = output_dir
+        self.upload_id = upload_id or uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._next_shard = 0
+
+    def __call__(self, batch: List[PolicyChunk]) -> None:
+        by_model: Dict[str, List[PolicyChunk]] = {}
+        for chunk in batch:
+            model_name = model_name_for_language(detect_language(chunk.text))
+            by_model.setdefault(model_name, []).append(chunk)
+
+        for model_name, chunks in by_model.items():
+            matrix = encode(model_name, [c.text for c in chunks])
+            with self._lock:
+                shard = self._next_shard
+                self._next_shard += 1
+            save_embedding_shard(
+                self.output_dir / model_name / self.upload_id / f"shard_{shard:06d}.npz",
+                matrix,
+                [text_hash(c.text) for c in chunks],
+                [c.policy_id for c in chunks],
+            )
+
+
+# -------------------------------------------------------------------
+# Pipeline
+# -------------------------------------------------------------------
+
+def ingest_uploads(
+    sources: Sequence[Path],
+    tenant: str = DEFAULT_TENANT,
+    handler: Optional[BatchHandler] = None,
+    batch_size: int = INGEST_BATCH_SIZE,
+    workers: int = INGEST_WORKERS,
+    max_in_flight: int = MAX_BATCHES_IN_FLIGHT,
+    replace_existing: bool = False,
+) -> IngestionStats:
+    """
+    Streams every document of sources: decode, normalize, save to the
+    tenant's policies folder, chunk, and send the chunks to handler in
+    batches of batch_size (default: embedding shards of the tenant).
+
+    Each document is saved as <name>.txt. A name seen earlier in the same
+    upload is rejected; so is the name of an existing policy, unless
+    replace_existing is set. Rejected names are listed in stats.rejected.
+
+    At most max_in_flight batches are queued or running in the worker pool;
+    the reader waits when the pool is full, which bounds memory use.
+    Errors raised by the handler are re-raised once the pool is drained.
+    """
+    paths = tenant_paths(tenant)
+    policies_dir = paths.policies_dir
+    writer = EmbeddingShardWriter(paths.embeddings_dir)
+    handler = handler or writer
+    stats = IngestionStats(upload_id=writer.upload_id)
+    seen: Set[str] = set()
+    slots = threading.BoundedSemaphore(max_in_flight)
+    futures: List[Future] = []
+    batch: List[PolicyChunk] = []
+
+    policies_dir.mkdir(parents=True, exist_ok=True)
+
+    def submit(pool: ThreadPoolExecutor, chunks: List[PolicyChunk]) -> None:
+        slots.acquire()
+        future = pool.submit(handler, chunks)
+        future.add_done_callback(lambda _: slots.release())
+        futures.append(future)
+        stats.batches += 1
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for source in sources:
+            for name, stream in iter_upload_documents(Path(source)):
+                text = read_document(stream)
+                if not text.strip():
+                    stats.skipped += 1
+                    continue
+
+                policy_id = f"{Path(name).stem}.txt"
+                key = policy_id.casefold()  # "A.txt" and "a.txt" are one file on Windows/macOS
+                if key in seen:
+                    logger.warning(f"Rejected {name}: another document of this upload is also named {policy_id}")
+                    stats.rejected.append(name)
+                    continue
+                seen.add(key)
+                if (policies_dir / policy_id).exists():
+                    if not replace_existing:
+                        logger.warning(f"Rejected {name}: policy {policy_id} already exists (upload with replace to overwrite)")
+                        stats.rejected.append(name)
+                        continue
+                    stats.replaced.append(policy_id)
+
+                (policies_dir / policy_id).write_text(text, encoding="utf-8")
+                stats.documents += 1
+
+                for piece in chunk_text(text):
+                    batch.append(PolicyChunk(chunk_id=stats.chunks, policy_id=policy_id, text=piece))
+                    stats.chunks += 1
+                    if len(batch) >= batch_size:
+                        submit(pool, batch)
+                        batch = []
+
+        if batch:
+            submit(pool, batch)
+
+    for future in futures:
+        future.result()
+
+    if stats.replaced and handler is writer:
+        # the embeddings of the old versions would otherwise be loaded forever
+        live = {text_hash(c.text) for c in load_policy_chunks(policies_dir)}
+        dropped = prune_embedding_shards(paths.embeddings_dir, live)
+        logger.info(f"Pruned {dropped} stale embeddings of {len(stats.replaced)} replaced policies")
+
+    logger.info(
+        f"Ingestion done (tenant '{tenant}', upload {stats.upload_id}): {stats.documents} documents, "
+        f"{stats.chunks} chunks, {stats.batches} batches, {stats.skipped} empty documents skipped, "
+        f"{len(stats.rejected)} rejected, {len(stats.replaced)} replaced"
+    )
+    return stats
+
+
+# -------------------------------------------------------------------
+# HTTP endpoint for the PoliciesUpload page
+# -------------------------------------------------------------------
+
+class UploadHandler(BaseHTTPRequestHandler):
+    """
+    POST /api/policies/upload[?tenant=<tenant_id>][&replace=1] with the raw
+    file (zip or .txt) as request body and its name in the X-Filename header
+    (the tenant can also be given in the X-Tenant header). The body is
+    streamed to a temp file and ingested in a background thread; the
+    response is 202 Accepted.
+    """
+
+    def do_POST(self) -> None:
+        url = urlparse(self.path)
+        if url.path != "/api/policies/upload":
+            self.send_error(404)
+            return
+
+        params = parse_qs(url.query)
+        tenant = params.get("tenant", [self.headers.get("X-Tenant", DEFAULT_TENANT)])[0]
+        replace_existing = params.get("replace", ["0"])[0] in ("1", "true")
+        try:
+            tenant_paths(tenant)
+        except ValueError as e:
+            self.send_error(400, str(e))
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        filename = Path(self.headers.get("X-Filename", "upload.zip")).name
+        tmp_dir = Path(tempfile.mkdtemp(prefix="arca_upload_"))
+        upload_path = tmp_dir / filename
+
+        remaining = length
+        with upload_path.open("wb") as f:
+            while remaining > 0:
+                block = self.rfile.read(min(READ_BLOCK_SIZE, remaining))
+                if not block:
+                    break
+                f.write(block)
+                remaining -= len(block)
+
+        def run() -> None:
+            try:
+                ingest_uploads([upload_path], tenant=tenant, replace_existing=replace_existing)
+            except Exception:
+                logger.exception(f"Ingestion failed for {filename}")
+            finally:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        threading.Thread(target=run, daemon=True).start()
+
+        body = json.dumps({"status": "accepted", "file": filename, "tenant": tenant}).encode("utf-8")
+        self.send_response(202)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(port: int) -> None:
+    server = ThreadingHTTPServer(("127.0.0.1", port), UploadHandler)
+    logger.info(f"Ingestion service listening on http://127.0.0.1:{port}/api/policies/upload")
+    server.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk policy ingestion")
+    parser.add_argument("sources", nargs="*", type=Path, help="zip archives, folders or .txt files")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS)
+    parser.add_argument("--tenant", default=DEFAULT_TENANT, help="Tenant id (folder under tenants/)")
+    parser.add_argument("--replace", action="store_true", help="Overwrite policies that already exist")
+    parser.add_argument("--serve", action="store_true", help="Run the upload HTTP endpoint")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+
+    if args.serve:
+        serve(args.port)
+        return
+
+    stats = ingest_uploads(
+        args.sources,
+        tenant=args.tenant,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        replace_existing=args.replace,
+    )
+    print(json.dumps(asdict(stats), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Lexical (BM25) index and rank fusion for the AuditorAgent
+
+- Builds an inverted index over the chunked policies/ corpus
+- Terms are the normalized index terms of corpus.index_terms (no stopwords,
+  plurals folded)
+- Posting lists are stored as delta-encoded arrays (doc id gaps + term freqs)
+- Rankings are merged with reciprocal rank fusion (RRF), see retrieval.py
+"""
+
+from __future__ import annotations
+
+import heapq
+import logging
+import math
+from array import array
+from collections import Counter, defaultdict
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+from corpus import PolicyChunk, index_terms
+
+
+logger = logging.getLogger("AuditorAgent.lexical_index")
+
+
+# -------------------------------------------------------------------
+# Config
+# -------------------------------------------------------------------
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+LEXICAL_CANDIDATES = 50  # how many BM25 hits take part in the hybrid ranking
+RRF_K = 60  # standard RRF damping constant
+
+
+# -------------------------------------------------------------------
+# BM25 inverted index
+# -------------------------------------------------------------------
+
+class BM25Index:
+    """
+    Inverted index with BM25 scoring.
+
+    For each term the posting list is a pair of compact arrays:
+      - gaps: doc ids in increasing order, stored as differences to the previous id
+      - tfs:  term frequency of the term in each of those docs
+    Doc ids are the chunk_id of the indexed PolicyChunk objects.
+    """
+
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B) -> None:
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self.doc_lengths = array("I")
+        self.avg_doc_length = 0.0
+
+    @property
+    def num_docs(self) -> int:
+        return len(self.doc_lengths)
+
+    @classmethod
+    def build(cls, chunks: Sequence[PolicyChunk], **kwargs: float) -> "BM25Index":
+        """
+        Builds the index from chunks whose chunk_id is their position (0..n-1).
+        """
+        index = cls(**kwargs)
+        raw_postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+
+        for doc_id, chunk in enumerate(chunks):
+            if chunk.chunk_id != doc_id:
+                raise ValueError("Chunks must be ordered by chunk_id, starting at 0.")
+            terms = index_terms(chunk.text)
+            index.doc_lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                raw_postings[term].append((doc_id, tf))
+
+        for term, entries in raw_postings.items():
+            gaps, tfs = array("I"), array("I")
+            previous = 0
+            for doc_id, tf in entries:  # already sorted: docs are visited in order
+                gaps.append(doc_id - previous)
+                tfs.append(tf)
+                previous = doc_id
+            index.postings[term] = (gaps, tfs)
+
+        if index.num_docs:
+            index.avg_doc_length = sum(index.doc_lengths) / index.num_docs
+
+        logger.info(f"BM25 index built: {index.num_docs} chunks, {len(index.postings)} terms")
+        return index
+
+    def iter_postings(self, term: str) -> Iterator[Tuple[int, int]]:
+        """
+        Decodes the posting list of a term into (doc_id, tf) pairs.
+        """
+        entry = self.postings.get(term)
+        if entry is None:
+            return
+        doc_id = 0
+        for gap, tf in zip(*entry):
+            doc_id += gap
+            yield doc_id, tf
+
+    def idf(self, term: str) -> float:
+        entry = self.postings.get(term)
+        df = len(entry[0]) if entry else 0
+        return math.log(1.0 + (self.num_docs - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, k: int = LEXICAL_CANDIDATES) -> List[Tuple[int, float]]:
+        """
+        Returns up to k (chunk_id, bm25_score) pairs, best first.
+        """
+        if not self.num_docs:
+            return []
+
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(index_terms(query)):
+            idf = self.idf(term)
+            for doc_id, tf in self.iter_postings(term):
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / self.avg_doc_length)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+
+# -------------------------------------------------------------------
+# Rank fusion
+# -------------------------------------------------------------------
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = RRF_K) -> Dict[int, float]:
+    """
+    Merges several rankings (lists of ids, best first) with RRF:
+    score(id) = sum over rankings of 1 / (k + rank), rank starting at 1.
+    """
+    fused: Dict[int, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] += 1.0 / (k + rank)
+    return dict(fused)
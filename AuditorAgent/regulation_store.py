@@ -0,0 +1,279 @@
+"""
+Versioned regulation store with clause-level caching for the AuditorAgent
+
+- A regulation text is split into clauses; each clause is identified by a
+  short sha256 hash (same scheme as generate_regulation_id in the Generator)
+- Every audited version is stored with its clause hashes, together with the
+  (clause, passage) similarity scores already computed, kept per embedding
+  model: cosines of two models are never mixed
+- When a regulation is amended, only the new/changed clauses (and passages
+  never seen before) are embedded and scored; other scores are reused
+- The run returns a diff against the previous version: risks that appeared,
+  disappeared or changed severity (a risk now scored by another model, e.g.
+  after the regulation changed language, is listed as rescored instead)
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+import sys
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from corpus import normalize_text, text_hash
+from embeddings import detect_language, encode, pair_model_name
+from severity import apply_severity
+
+# Shared code (arca_common) lives at the project root
+_PROJECT_ROOT = str(Path(__file__).resolve().parent.parent)
+if _PROJECT_ROOT not in sys.path:
+    sys.path.append(_PROJECT_ROOT)
+from arca_common.serialization import (  # noqa: E402
+    INTERNAL_SUFFIX,
+    JSON_SUFFIX,
+    MSGPACK_SUFFIX,
+    newest_existing,
+    read_data,
+    write_atomic,
+)
+
+
+logger = logging.getLogger("AuditorAgent.regulation_store")
+
+
+# -------------------------------------------------------------------
+# Config
+# -------------------------------------------------------------------
+
+BASE_DIR = Path(__file__).resolve().parent
+REGULATIONS_DIR = BASE_DIR / "outputs" / "regulations"
+
+
+# -------------------------------------------------------------------
+# Clauses and hashes
+# -------------------------------------------------------------------
+
+# One clause per non-empty line, long lines split on sentence ends
+_SENTENCE_END_RE = re.compile(r"(?<=[.;!?])\s+(?=[A-Z0-9\u00C0-\u024F\u0600-\u06FF])")
+
+
+def split_clauses(text: str) -> List[str]:
+    """
+    Splits a regulation text into clauses (lines, then sentences).
+    """
+    clauses: List[str] = []
+    for line in normalize_text(text).split("\n"):
+        for sentence in _SENTENCE_END_RE.split(line):
+            sentence = sentence.strip()
+            if sentence:
+                clauses.append(sentence)
+    return clauses
+
+
+def passage_key(passage: Dict[str, Any]) -> str:
+    return f"{passage['file']}::{text_hash(passage['excerpt'])}"
+
+
+# -------------------------------------------------------------------
+# Store (one file per regulation, in the ARCA_INTERNAL_FORMAT format)
+# -------------------------------------------------------------------
+
+def _record_path(name: str, store_dir: Path, suffix: str = INTERNAL_SUFFIX) -> Path:
+    safe_name = re.sub(r"[^\w.-]+", "_", name)
+    return store_dir / f"{safe_name}{suffix}"
+
+
+def _record_paths(name: str, store_dir: Path) -> List[Path]:
+    return [_record_path(name, store_dir, suffix) for suffix in (JSON_SUFFIX, MSGPACK_SUFFIX)]
+
+
+def load_record(name: str, store_dir: Path = REGULATIONS_DIR) -> Dict[str, Any]:
+    # after an ARCA_INTERNAL_FORMAT change both files can exist: the newest wins
+    path = newest_existing(*_record_paths(name, store_dir))
+    if path is not None:
+        return read_data(path)
+    return {"regulation": name, "versions": [], "scores": {}, "last_results": []}
+
+
+def _scores_by_model(record: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    # {model_name: {"<clause_hash>::<passage_key>": score}}; records written
+    # before scores were kept per model have a flat dict of unknown model
+    scores = record["scores"]
+    if any(not isinstance(v, dict) for v in scores.values()):
+        logger.info(f"Regulation '{record['regulation']}': dropping cached scores of unknown model")
+        scores = {}
+    return scores
+
+
+def save_record(record: Dict[str, Any], store_dir: Path = REGULATIONS_DIR) -> None:
+    path = _record_path(record["regulation"], store_dir)
+    write_atomic(path, record)
+    for other in _record_paths(record["regulation"], store_dir):
+        if other != path and other.exists():
+            other.unlink()  # never leave a stale copy in the other format
+    logger.info(f"Regulation record saved to: {path}")
+
+
+# -------------------------------------------------------------------
+# Scoring with cache reuse
+# -------------------------------------------------------------------
+
+def _score_missing(
+    model_name: str,
+    clauses: Dict[str, str],
+    passages: Dict[str, str],
+    scores: Dict[str, float],
+) -> int:
+    """
+    Fills scores["<clause_hash>::<passage_key>"] (scores of model_name) for
+    every missing pair. Only the clauses and passages involved in a missing
+    pair are encoded. Returns the number of pairs computed.
+    """
+    missing = [
+        (c, p) for c in clauses for p in passages if f"{c}::{p}" not in scores
+    ]
+    if not missing:
+        return 0
+
+    clause_ids = sorted({c for c, _ in missing})
+    passage_ids = sorted({p for _, p in missing})
+    embeddings = encode(model_name, [clauses[c] for c in clause_ids] + [passages[p] for p in passage_ids])
+    clause_rows = {c: i for i, c in enumerate(clause_ids)}
+    passage_rows = {p: len(clause_ids) + i for i, p in enumerate(passage_ids)}
+
+    for c, p in missing:
+        score = float(np.dot(embeddings[clause_rows[c]], embeddings[passage_rows[p]]))
+        scores[f"{c}::{p}"] = score
+    return len(missing)
+
+
+def _diff_results(previous: List[Dict[str, Any]], current: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    prev_by_key = {r["passage_key"]: r for r in previous}
+    curr_by_key = {r["passage_key"]: r for r in current}
+
+    def brief(r: Dict[str, Any]) -> Dict[str, Any]:
+        return {"policy_id": r["policy_id"], "severity": r["severity"], "new_rule_excerpt": r["new_rule_excerpt"]}
+
+    def same_model(k: str) -> bool:
+        # results saved before the model was recorded count as the same model
+        return prev_by_key[k].get("embedding_model", curr_by_key[k]["embedding_model"]) == curr_by_key[k]["embedding_model"]
+
+    both = [k for k in curr_by_key if k in prev_by_key]
+    return {
+        "risks_appeared": [brief(r) for k, r in curr_by_key.items() if k not in prev_by_key],
+        "risks_disappeared": [brief(r) for k, r in prev_by_key.items() if k not in curr_by_key],
+        "severity_changed": [
+            {
+                "policy_id": curr_by_key[k]["policy_id"],
+                "previous_severity": prev_by_key[k]["severity"],
+                "severity": curr_by_key[k]["severity"],
+                "new_rule_excerpt": curr_by_key[k]["new_rule_excerpt"],
+            }
+            for k in both
+            if same_model(k) and prev_by_key[k]["severity"] != curr_by_key[k]["severity"]
+        ],
+        # scored by another model than last time: severities are not comparable
+        "risks_rescored": [
+            {
+                "policy_id": curr_by_key[k]["policy_id"],
+                "previous_model": prev_by_key[k]["embedding_model"],
+                "model": curr_by_key[k]["embedding_model"],
+                "previous_severity": prev_by_key[k]["severity"],
+                "severity": curr_by_key[k]["severity"],
+            }
+            for k in both
+            if not same_model(k)
+        ],
+    }
+
+
+def audit_regulation(
+    name: str,
+    text: str,
+    passages: Sequence[Dict[str, Any]],
+    store_dir: Path = REGULATIONS_DIR,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Audits a (possibly amended) regulation against passages ("file", "excerpt").
+
+    Each passage is scored against every clause with the model for the pair
+    of languages (embeddings.pair_model_name); the best clause gives the
+    similarity (severity comes from severity.apply_severity) and becomes the
+    risk's new_rule_excerpt. Scores of unchanged clauses, by the same model,
+    come from the store. Returns (auditor results, diff vs previous version).
+    """
+    record = load_record(name, store_dir)
+    previous_version: Optional[Dict[str, Any]] = record["versions"][-1] if record["versions"] else None
+
+    clauses = {text_hash(c): c for c in split_clauses(text)}
+    scores_by_model = _scores_by_model(record)
+
+    language = detect_language(text)
+    passage_models = {passage_key(p): pair_model_name(language, detect_language(p["excerpt"])) for p in passages}
+    computed = 0
+    for model_name in sorted(set(passage_models.values())):
+        passage_texts = {passage_key(p): p["excerpt"] for p in passages if passage_models[passage_key(p)] == model_name}
+        computed += _score_missing(model_name, clauses, passage_texts, scores_by_model.setdefault(model_name, {}))
+    logger.info(
+        f"Regulation '{name}': {len(clauses)} clauses, {computed} pairs scored, "
+        f"{len(clauses) * len(passage_models) - computed} reused from cache"
+    )
+
+    results: List[Dict[str, Any]] = []
+    for p in passages:
+        key = passage_key(p)
+        model_name = passage_models[key]
+        scores = scores_by_model[model_name]
+        best_clause = max(clauses, key=lambda c: scores[f"{c}::{key}"]) if clauses else None
+        best_score = scores[f"{best_clause}::{key}"] if best_clause else 0.0
+        results.append({
+            "policy_id": p["file"],
+            "severity": None,  # set by apply_severity below
+            "divergence_summary": "",
+            "conflicting_policy_excerpt": p["excerpt"],
+            "new_rule_excerpt": clauses.get(best_clause, text),
+            "recommendation": "Review and update internal policy if needed",
+            "similarity": round(best_score, 4),
+            "clause_hash": best_clause,
+            "passage_key": key,
+            "embedding_model": model_name,
+        })
+    apply_severity(results)
+
+    previous_clauses = {c["clause_hash"] for c in previous_version["clauses"]} if previous_version else set()
+    regulation_hash = text_hash(text)
+    unchanged_text = previous_version is not None and previous_version["regulation_hash"] == regulation_hash
+    diff: Dict[str, Any] = {
+        "regulation": name,
+        "from_version": previous_version["version"] if previous_version else None,
+        "to_version": previous_version["version"] if unchanged_text else len(record["versions"]) + 1,
+        "clauses_added": [clauses[c] for c in clauses if c not in previous_clauses],
+        "clauses_removed": [
+            c["text"] for c in (previous_version["clauses"] if previous_version else [])
+            if c["clause_hash"] not in clauses
+        ],
+        "clauses_unchanged": len(previous_clauses & set(clauses)),
+    }
+    diff.update(_diff_results(record["last_results"], results))
+
+    if not unchanged_text:
+        record["versions"].append({
+            "version": diff["to_version"],
+            "date_processed": date.today().isoformat(),
+            "regulation_hash": regulation_hash,
+            "clauses": [{"clause_hash": c, "text": t} for c, t in clauses.items()],
+        })
+    # keep only the scores the current version can reuse next time, and only
+    # for the models that scored this version (a model no longer used is dropped)
+    record["scores"] = {
+        model_name: {k: v for k, v in scores_by_model[model_name].items() if k.split("::", 1)[0] in clauses}
+        for model_name in set(passage_models.values())
+    }
+    record["last_results"] = results
+    save_record(record, store_dir)
+
+    return results, diff
@@ -0,0 +1,154 @@
+"""
+Hybrid retrieval (BM25 + embeddings) for the AuditorAgent
+
+- Every chunk is embedded by the model of its own language (the per-model
+  indexes of embeddings.build_indexes), once, when the retriever is built;
+  a query then only encodes the query itself, whatever the corpus size
+- Chunks in another language than the query are compared with the
+  multilingual model (their multilingual embeddings are added to that
+  index on first need, then kept)
+- BM25 only ranks chunks in the query's language: across languages the
+  only shared terms are numbers and names, which would pick chunks at random
+- Candidates are the BM25 top hits plus the nearest chunks of each model;
+  the rankings are merged with reciprocal rank fusion (RRF), since cosines
+  of different models are not comparable
+"""
+
+from __future__ import annotations
+
+import heapq
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from corpus import PolicyChunk
+from embeddings import EmbeddingIndex, build_indexes, detect_language, encode, pair_model_name
+from lexical_index import LEXICAL_CANDIDATES, RRF_K, BM25Index, reciprocal_rank_fusion
+
+
+logger = logging.getLogger("AuditorAgent.retrieval")
+
+
+# -------------------------------------------------------------------
+# Config
+# -------------------------------------------------------------------
+
+SEMANTIC_CANDIDATES = 50  # how many nearest chunks of each model take part in the hybrid ranking
+
+
+def _encode_query(model_name: str, query: str) -> np.ndarray:
+    return encode(model_name, [query])[0]
+
+
+# -------------------------------------------------------------------
+# Retriever
+# -------------------------------------------------------------------
+
+class HybridRetriever:
+    """
+    BM25 index and per-model embedding indexes over the same chunks
+    (chunk_id = position). cache_dir holds the ingestion embedding shards to
+    reuse. Thread-safe: a tenant's retriever is shared by every request of
+    that tenant. on_growth, if set, is called after an index grew (so an
+    owner tracking memory can measure it again).
+    """
+
+    def __init__(
+        self,
+        chunks: Sequence[PolicyChunk],
+        bm25: Optional[BM25Index] = None,
+        indexes: Optional[Dict[str, EmbeddingIndex]] = None,
+        cache_dir: Optional[Path] = None,
+    ) -> None:
+        self.chunks = list(chunks)
+        self.bm25 = bm25 if bm25 is not None else BM25Index.build(self.chunks)
+        self.languages = [detect_language(c.text) for c in self.chunks]
+        self.indexes = indexes if indexes is not None else build_indexes(self.chunks, cache_dir=cache_dir)
+        self._groups: Dict[str, Dict[str, List[int]]] = {}
+        self._lock = threading.Lock()
+        self.on_growth: Optional[Callable[[], None]] = None
+
+    def _model_groups(self, language: str) -> Dict[str, List[int]]:
+        # chunk ids grouped by the model that compares them with a query in language
+        groups = self._groups.get(language)
+        if groups is None:
+            groups = {}
+            for chunk_id, chunk_language in enumerate(self.languages):
+                groups.setdefault(pair_model_name(language, chunk_language), []).append(chunk_id)
+            self._groups[language] = groups
+        return groups
+
+    def _index_with(self, model_name: str, chunk_ids: List[int]) -> EmbeddingIndex:
+        # makes sure chunk_ids are in the model_name index (cross-language
+        # chunks are encoded with the multilingual model on first need)
+        with self._lock:
+            index = self.indexes.get(model_name)
+            if index is None:
+                index = self.indexes[model_name] = EmbeddingIndex(model_name=model_name)
+            missing = [c for c in chunk_ids if c not in index]
+            if missing:
+                index.add(missing, encode(model_name, [self.chunks[c].text for c in missing]))
+                logger.info(f"Index '{model_name}': +{len(missing)} chunks")
+        if missing and self.on_growth is not None:
+            self.on_growth()
+        return index
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 5,
+        lexical_k: int = LEXICAL_CANDIDATES,
+        semantic_k: int = SEMANTIC_CANDIDATES,
+        rrf_k: int = RRF_K,
+        encode_query: Callable[[str, str], np.ndarray] = _encode_query,
+    ) -> List[Dict[str, Any]]:
+        """
+        Retrieves the top_k passages for query.
+        encode_query(model_name, query) returns the normalized query embedding
+        (callers with their own query cache can pass it in).
+        Returns passages in the Researcher schema ("file", "excerpt") plus
+        scores; embedding_score is the cosine under embedding_model.
+        """
+        if not self.chunks:
+            return []
+
+        language = detect_language(query)
+        lexical_hits = [
+            (doc_id, score)
+            for doc_id, score in self.bm25.search(query, k=lexical_k)
+            if self.languages[doc_id] == language
+        ]
+        rankings: List[List[int]] = [[doc_id for doc_id, _ in lexical_hits]]
+        cosines: Dict[int, float] = {}
+        models: Dict[int, str] = {}
+
+        for model_name, chunk_ids in self._model_groups(language).items():
+            index = self._index_with(model_name, chunk_ids)
+            scores = (index.matrix @ encode_query(model_name, query))[index.rows(chunk_ids)]
+            k = min(semantic_k, len(scores))
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best], kind="stable")]
+            rankings.append([chunk_ids[i] for i in best])
+            for chunk_id, score in zip(chunk_ids, scores.tolist()):
+                cosines[chunk_id] = score
+                models[chunk_id] = model_name
+
+        fused = reciprocal_rank_fusion(rankings, k=rrf_k)
+        best_ids = heapq.nlargest(top_k, fused.items(), key=lambda item: item[1])
+        lexical_scores = dict(lexical_hits)
+
+        return [
+            {
+                "file": self.chunks[doc_id].policy_id,
+                "excerpt": self.chunks[doc_id].text,
+                "chunk_id": doc_id,
+                "bm25_score": lexical_scores.get(doc_id, 0.0),
+                "embedding_score": cosines[doc_id],
+                "embedding_model": models[doc_id],
+                "rrf_score": score,
+            }
+            for doc_id, score in best_ids
+        ]
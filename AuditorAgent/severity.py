@@ -0,0 +1,120 @@
+"""
+Severity scoring stage for the AuditorAgent
+
+- Thresholds are defined per policy category, the category being the policy
+  file prefix ("mining_safety_78.txt" -> "mining_safety")
+- Labels are assigned with np.searchsorted over the score array of each
+  category (no per-row if/elif)
+- Each row also gets a "confidence": a heuristic margin score, i.e. how far
+  its score is from the nearest threshold squashed with a hand-picked
+  logistic curve (0.5 on a threshold). It only ranks rows by how clear-cut
+  their label is; it is not a calibrated probability
+- Severity aggregates (counts, highest level, per category) come from
+  arca_common.severity_summary, which the GeneratorAgent also uses
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# Shared code (arca_common) lives at the project root
+_PROJECT_ROOT = str(Path(__file__).resolve().parent.parent)
+if _PROJECT_ROOT not in sys.path:
+    sys.path.append(_PROJECT_ROOT)
+from arca_common.severity_summary import policy_category, summarize_severities  # noqa: E402
+
+
+# -------------------------------------------------------------------
+# Thresholds per category: (MEDIUM from, HIGH from)
+# -------------------------------------------------------------------
+
+DEFAULT_THRESHOLDS: Tuple[float, float] = (0.5, 0.75)
+
+# Safety, health and personal-data policies are flagged earlier
+CATEGORY_THRESHOLDS: Dict[str, Tuple[float, float]] = {
+    "mining_safety": (0.45, 0.68),
+    "workplace_safety": (0.45, 0.68),
+    "electrical_safety": (0.45, 0.68),
+    "laboratory_safety": (0.45, 0.68),
+    "fire_prevention": (0.45, 0.68),
+    "patient_rights": (0.45, 0.7),
+    "patient_confidentiality": (0.45, 0.7),
+    "data_privacy": (0.45, 0.7),
+    "password_security": (0.45, 0.7),
+    "student_data_protection": (0.45, 0.7),
+    "brand_guidelines": (0.55, 0.8),
+    "professional_appearance": (0.55, 0.8),
+    "conference_room_usage": (0.55, 0.8),
+}
+
+SEVERITY_LEVELS = np.array(["LOW", "MEDIUM", "HIGH"])
+SEVERITY_SUMMARIES = {
+    "HIGH": "Conflict detected with high similarity",
+    "MEDIUM": "Potential conflict detected",
+    "LOW": "No major conflict detected",
+}
+
+# Hand-picked logistic slope of the margin score (not fitted on labelled
+# data): a score 0.1 away from a threshold gives ~0.92
+CONFIDENCE_SLOPE = 25.0
+
+
+def thresholds_for(category: str) -> Tuple[float, float]:
+    return CATEGORY_THRESHOLDS.get(category, DEFAULT_THRESHOLDS)
+
+
+# -------------------------------------------------------------------
+# Vectorized scoring
+# -------------------------------------------------------------------
+
+def score_severity(
+    scores: Sequence[float],
+    policy_ids: Sequence[str],
+) -> Tuple[np.ndarray, np.ndarray, List[str], Dict[str, Any]]:
+    """
+    Scores every row at once.
+    Returns (labels, confidences, categories, summary) where labels and
+    confidences (heuristic margin scores) are arrays aligned with scores.
+    """
+    score_arr = np.asarray(scores, dtype=np.float64)
+    categories = [policy_category(pid) for pid in policy_ids]
+    cat_arr = np.asarray(categories, dtype=object)
+
+    level_idx = np.zeros(len(score_arr), dtype=np.int64)
+    margin = np.zeros(len(score_arr), dtype=np.float64)
+
+    for category in set(categories):
+        rows = np.nonzero(cat_arr == category)[0]
+        bounds = np.asarray(thresholds_for(category), dtype=np.float64)
+        values = score_arr[rows]
+        level_idx[rows] = np.searchsorted(bounds, values, side="right")
+        margin[rows] = np.min(np.abs(values[:, None] - bounds[None, :]), axis=1)
+
+    labels = SEVERITY_LEVELS[level_idx]
+    confidences = 1.0 / (1.0 + np.exp(-CONFIDENCE_SLOPE * margin))
+
+    summary = summarize_severities(policy_ids, labels.tolist(), score_arr.tolist())
+    return labels, confidences, categories, summary
+
+
+def apply_severity(results: List[Dict[str, Any]], summaries: bool = True) -> Dict[str, Any]:
+    """
+    Sets "severity", "confidence" (margin score) and "category" on auditor rows (in place)
+    from their "similarity" score, and "divergence_summary" if summaries is True.
+    Returns the severity summary of the rows.
+    """
+    labels, confidences, categories, summary = score_severity(
+        [r["similarity"] for r in results],
+        [r["policy_id"] for r in results],
+    )
+    for row, label, confidence, category in zip(results, labels.tolist(), confidences.tolist(), categories):
+        row["severity"] = label
+        row["confidence"] = round(confidence, 4)
+        row["category"] = category
+        if summaries:
+            row["divergence_summary"] = SEVERITY_SUMMARIES[label]
+    return summary
@@ -0,0 +1,312 @@
+"""
+Multi-tenant support for ARCA
+
+Each business unit (tenant) has its own folder under tenants/; the
+"default" tenant is the original single-tenant layout, so existing runs are
+unchanged. Tenant ids and paths are shared by every agent and live in
+arca_common.tenancy (re-exported here).
+
+One process serves every tenant:
+- the embedding models are shared (embeddings.get_model loads each model once)
+- each tenant gets its own lexical and embedding indexes, loaded on first use
+- loaded indexes are kept in an LRU; each tenant has a memory quota and cold
+  tenants are unloaded when the total budget is exceeded; an index is
+  measured again whenever it grows (cross-language embeddings added on first
+  need). A tenant over its quota is refused until its policies change
+- an index is rebuilt when its tenant's policies/ folder changed (checked at
+  most every FRESHNESS_CHECK_S seconds, so uploads done by another process
+  are picked up); each build gets a new generation number
+"""
+
+from __future__ import annotations
+
+import hashlib
+import itertools
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from corpus import PolicyChunk, iter_policy_files, load_policy_chunks
+from dedup import find_policy_duplicates, non_representatives, save_policy_groups
+from lexical_index import BM25Index
+from retrieval import HybridRetriever
+from severity import apply_severity
+
+# Shared code (arca_common) lives at the project root
+_PROJECT_ROOT = str(Path(__file__).resolve().parent.parent)
+if _PROJECT_ROOT not in sys.path:
+    sys.path.append(_PROJECT_ROOT)
+from arca_common.serialization import write_atomic  # noqa: E402
+from arca_common.tenancy import (  # noqa: E402,F401  (re-exported for the AuditorAgent modules)
+    DEFAULT_TENANT,
+    TENANTS_DIR,
+    TenantPaths,
+    list_tenants,
+    tenant_paths,
+)
+
+
+logger = logging.getLogger("AuditorAgent.tenants")
+
+
+# -------------------------------------------------------------------
+# Config
+# -------------------------------------------------------------------
+
+TENANT_QUOTA_MB = 256  # max memory of one tenant's loaded index
+TOTAL_BUDGET_MB = 1024  # max memory of all loaded tenant indexes
+FRESHNESS_CHECK_S = 30.0  # how often a loaded index checks its policies/ folder
+
+
+class TenantQuotaExceeded(RuntimeError):
+    """Raised when a tenant's index does not fit in its memory quota."""
+
+
+# -------------------------------------------------------------------
+# Per-tenant index
+# -------------------------------------------------------------------
+
+@dataclass
+class TenantIndex:
+    tenant_id: str
+    chunks: List[PolicyChunk]
+    retriever: HybridRetriever
+    skipped_policies: Set[str] = field(default_factory=set)
+    fingerprint: str = ""  # policies_fingerprint when the index was built
+    generation: int = 0  # set by the registry; changes on every rebuild
+    checked_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def bm25(self) -> BM25Index:
+        return self.retriever.bm25
+
+    def is_stale(self, interval: float = FRESHNESS_CHECK_S) -> bool:
+        """
+        True if the tenant's policies changed since the build. The folder is
+        only scanned once per interval.
+        """
+        now = time.monotonic()
+        if now - self.checked_at < interval:
+            return False
+        self.checked_at = now
+        return policies_fingerprint(tenant_paths(self.tenant_id).policies_dir) != self.fingerprint
+
+    def memory_bytes(self) -> int:
+        """
+        Size of everything the index keeps alive (see _deep_sizeof): chunks,
+        BM25 postings, per-model embedding matrices and their row maps.
+        """
+        return _deep_sizeof((self.chunks, self.retriever, self.skipped_policies))
+
+
+def _deep_sizeof(root: Any) -> int:
+    """
+    sys.getsizeof of root and of every object reachable from it through
+    containers and instance attributes, each object counted once; numpy
+    arrays count their data buffer. Shallow getsizeof alone misses the
+    contents of containers and underestimates an index several times.
+    """
+    seen: Set[int] = set()
+    stack = [root]
+    size = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, np.ndarray):
+            size += sys.getsizeof(obj) + (obj.nbytes if obj.base is not None else 0)
+            continue
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif hasattr(obj, "__dict__") and not isinstance(obj, type):
+            stack.append(obj.__dict__)
+    return size
+
+
+def policies_fingerprint(policies_dir: Path) -> str:
+    """
+    Hash of the names, sizes and modification times of the policy files.
+    """
+    h = hashlib.sha256()
+    if policies_dir.exists():
+        for path in iter_policy_files(policies_dir):
+            stat = path.stat()
+            h.update(f"{path.name}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def build_tenant_index(tenant_id: str) -> TenantIndex:
+    """
+    Dedups and indexes the policies of a tenant, and writes its policy_groups.json.
+    """
+    paths = tenant_paths(tenant_id)
+    fingerprint = policies_fingerprint(paths.policies_dir)  # before reading: a change during the build is seen later
+    groups = find_policy_duplicates(paths.policies_dir)
+    save_policy_groups(groups, paths.policy_groups)
+    skipped = non_representatives(groups)
+
+    chunks = load_policy_chunks(paths.policies_dir, exclude=skipped)
+    return TenantIndex(
+        tenant_id=tenant_id,
+        chunks=chunks,
+        retriever=HybridRetriever(chunks, cache_dir=paths.embeddings_dir),
+        skipped_policies=skipped,
+        fingerprint=fingerprint,
+    )
+
+
+class TenantRegistry:
+    """
+    LRU of loaded tenant indexes with a per-tenant quota and a total budget.
+    Thread-safe; the embedding models themselves are shared process-wide.
+    """
+
+    def __init__(self, tenant_quota_mb: float = TENANT_QUOTA_MB, total_budget_mb: float = TOTAL_BUDGET_MB) -> None:
+        self.tenant_quota = int(tenant_quota_mb * 1024 * 1024)
+        self.total_budget = int(total_budget_mb * 1024 * 1024)
+        self._indexes: "OrderedDict[str, TenantIndex]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._over_quota: Dict[str, Tuple[str, str]] = {}  # tenant -> (fingerprint, error)
+        self._generations = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @property
+    def loaded_bytes(self) -> int:
+        return sum(self._sizes.values())
+
+    def _cached(self, tenant_id: str) -> Optional[TenantIndex]:
+        with self._lock:
+            index = self._indexes.get(tenant_id)
+            if index is not None:
+                self._indexes.move_to_end(tenant_id)
+        if index is not None and index.is_stale():
+            logger.info(f"Tenant '{tenant_id}' policies changed, reloading its index")
+            self.invalidate(tenant_id, index)
+            return None
+        return index
+
+    def get(self, tenant_id: str) -> TenantIndex:
+        index = self._cached(tenant_id)
+        if index is not None:
+            return index
+        with self._lock:
+            build_lock = self._build_locks.setdefault(tenant_id, threading.Lock())
+
+        # one build per tenant at a time: concurrent misses wait for it
+        # instead of building the same index twice
+        with build_lock:
+            index = self._cached(tenant_id)
+            if index is not None:
+                return index
+
+            # an index over quota is not rebuilt until the policies change
+            refused = self._over_quota.get(tenant_id)
+            if refused is not None and refused[0] == policies_fingerprint(tenant_paths(tenant_id).policies_dir):
+                raise TenantQuotaExceeded(refused[1])
+
+            index = build_tenant_index(tenant_id)
+            size = index.memory_bytes()
+            if size > self.tenant_quota:
+                raise self._refuse(index, size)
+
+            with self._lock:
+                self._over_quota.pop(tenant_id, None)
+                index.generation = next(self._generations)
+                self._indexes[tenant_id] = index
+                self._sizes[tenant_id] = size
+                self._evict()
+            index.retriever.on_growth = lambda: self._measure(index)
+        logger.info(f"Tenant '{tenant_id}' loaded ({size / 1e6:.1f} MB, {len(self._indexes)} tenants in memory)")
+        return index
+
+    def _refuse(self, index: TenantIndex, size: int) -> TenantQuotaExceeded:
+        # remembers that this version of the tenant's policies does not fit
+        message = (
+            f"Tenant '{index.tenant_id}' index needs {size / 1e6:.1f} MB, "
+            f"quota is {self.tenant_quota / 1e6:.1f} MB"
+        )
+        with self._lock:
+            self._over_quota[index.tenant_id] = (index.fingerprint, message)
+        return TenantQuotaExceeded(message)
+
+    def _measure(self, index: TenantIndex) -> None:
+        # called by the retriever after one of its embedding indexes grew
+        size = index.memory_bytes()
+        if size > self.tenant_quota:
+            logger.warning(f"Tenant '{index.tenant_id}' grew over its quota, unloading it")
+            self._refuse(index, size)
+            self.invalidate(index.tenant_id, index)
+            return
+        with self._lock:
+            if self._indexes.get(index.tenant_id) is index:
+                self._sizes[index.tenant_id] = size
+                self._evict()
+
+    def invalidate(self, tenant_id: str, index: Optional[TenantIndex] = None) -> None:
+        """
+        Drops a tenant's index (e.g. after its policies changed); reloaded on
+        next use. If index is given, drops it only if it is still the loaded one.
+        """
+        with self._lock:
+            if index is not None and self._indexes.get(tenant_id) is not index:
+                return
+            self._indexes.pop(tenant_id, None)
+            self._sizes.pop(tenant_id, None)
+
+    def _evict(self) -> None:
+        # never evict the most recently used tenant (the one just loaded)
+        while self.loaded_bytes > self.total_budget and len(self._indexes) > 1:
+            cold_id, _ = self._indexes.popitem(last=False)
+            self._sizes.pop(cold_id, None)
+            logger.info(f"Tenant '{cold_id}' unloaded (LRU)")
+
+
+# -------------------------------------------------------------------
+# Per-tenant audit (same steps as the auditor notebook)
+# -------------------------------------------------------------------
+
+def audit_tenant(
+    registry: TenantRegistry,
+    tenant_id: str,
+    regulation_text: str,
+    top_k: int = 5,
+) -> Dict[str, Any]:
+    """
+    Audits a regulation against one tenant's policies and writes the tenant's
+    auditor_output.json. The embedding model is the shared one for the
+    regulation's language.
+    """
+    index = registry.get(tenant_id)
+    passages = index.retriever.search(regulation_text, top_k=top_k)
+
+    results: List[Dict[str, Any]] = [
+        {
+            "policy_id": p["file"],
+            "severity": None,  # set by apply_severity below
+            "divergence_summary": "",
+            "conflicting_policy_excerpt": p["excerpt"],
+            "new_rule_excerpt": regulation_text,
+            "recommendation": "Review and update internal policy if needed",
+            "similarity": round(p["embedding_score"], 4),
+        }
+        for p in passages
+    ]
+    output = {"results": results, "severity_summary": apply_severity(results)}
+
+    path = tenant_paths(tenant_id).auditor_output
+    write_atomic(path, output)
+    logger.info(f"Tenant '{tenant_id}' auditor output saved to: {path}")
+    return output
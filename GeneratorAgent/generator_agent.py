@@ -3,19 +3,27 @@ Generator Agent (Agent n°3) for ARCA
 
 - Loads auditor_output.json produced by the AuditorAgent
 - Validates and normalizes the risks
+- Fans risks out to near-duplicate policies grouped by the AuditorAgent,
+  then recomputes the severity summary so its counts match the report
+- Adds the changes since the previous regulation version (if the auditor
+  ran with the clause cache)
 - Builds the final ARCA JSON report with the required schema
 - Saves it to GeneratorAgent/outputs/final_report.json
+
+With --policy-conflicts, the same pipeline reports the policy-policy
+conflicts (AuditorAgent/outputs/policy_conflicts.json) instead.
 """
 
 from __future__ import annotations
 
-import json
+import argparse
 import logging
 import hashlib
-from dataclasses import dataclass
+import sys
+from dataclasses import dataclass, replace
 from datetime import date
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 
 # -------------------------------------------------------------------
@@ -36,8 +44,35 @@ logger = logging.getLogger("GeneratorAgent")
 BASE_DIR = Path(__file__).resolve().parent
 PROJECT_ROOT = BASE_DIR.parent
 
-AUDITOR_OUTPUT_PATH = PROJECT_ROOT / "AuditorAgent" / "outputs" / "auditor_output.json"
-FINAL_REPORT_PATH = BASE_DIR / "outputs" / "final_report.json"
+# Shared code (arca_common) lives at the project root
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+from arca_common.serialization import read_data, write_atomic  # noqa: E402
+from arca_common.severity_summary import summarize_severities  # noqa: E402
+from arca_common.tenancy import DEFAULT_TENANT, tenant_paths  # noqa: E402
+
+# Default tenant paths (multi-tenant layout: see arca_common.tenancy)
+_DEFAULT_PATHS = tenant_paths(DEFAULT_TENANT)
+AUDITOR_OUTPUT_PATH = _DEFAULT_PATHS.auditor_output
+POLICY_GROUPS_PATH = _DEFAULT_PATHS.policy_groups
+POLICY_CONFLICTS_PATH = _DEFAULT_PATHS.policy_conflicts
+FINAL_REPORT_PATH = _DEFAULT_PATHS.final_report
+POLICY_CONFLICTS_REPORT_PATH = _DEFAULT_PATHS.policy_conflicts_report
+
+
+def tenant_io_paths(tenant: str = DEFAULT_TENANT) -> Dict[str, Path]:
+    """
+    Returns the input/output paths of the Generator for a tenant.
+    The default tenant keeps the original single-tenant paths above.
+    """
+    paths = tenant_paths(tenant)
+    return {
+        "auditor_output": paths.auditor_output,
+        "policy_groups": paths.policy_groups,
+        "policy_conflicts": paths.policy_conflicts,
+        "final_report": paths.final_report,
+        "policy_conflicts_report": paths.policy_conflicts_report,
+    }
 
 
 # -------------------------------------------------------------------
@@ -51,6 +86,9 @@ class Risk:
     divergence_summary: str
     conflicting_policy_excerpt: str
     new_rule_excerpt: str
+    duplicate_of: Optional[str] = None
+    similarity: Optional[float] = None
+    confidence: Optional[float] = None
 
     @classmethod
     def from_raw(cls, raw: Dict[str, Any]) -> "Risk":
@@ -76,6 +114,9 @@ class Risk:
             divergence_summary=str(raw["divergence_summary"]),
             conflicting_policy_excerpt=str(raw["conflicting_policy_excerpt"]),
             new_rule_excerpt=str(raw["new_rule_excerpt"]),
+            duplicate_of=raw.get("duplicate_of"),
+            similarity=raw.get("similarity"),
+            confidence=raw.get("confidence"),
         )
 
 
@@ -96,8 +137,7 @@ def load_auditor_output(path: Path = AUDITOR_OUTPUT_PATH) -> List[Risk]:
         )
 
     logger.info(f"Loading auditor output from: {path}")
-    with path.open("r", encoding="utf-8") as f:
-        data = json.load(f)
+    data = read_data(path)
 
     # Accept both: [ {...}, {...} ]  or { "results": [ ... ] }
     if isinstance(data, dict) and "results" in data:
@@ -122,18 +162,95 @@ def load_auditor_output(path: Path = AUDITOR_OUTPUT_PATH) -> List[Risk]:
     return risks
 
 
+def _load_auditor_section(path: Path, key: str) -> Optional[Dict[str, Any]]:
+    if not path.exists():
+        return None
+
+    data = read_data(path)
+    if isinstance(data, dict) and isinstance(data.get(key), dict):
+        return data[key]
+    return None
+
+
+def load_regulation_diff(path: Path = AUDITOR_OUTPUT_PATH) -> Optional[Dict[str, Any]]:
+    """
+    Returns the "regulation_diff" object of auditor_output.json, written when
+    the AuditorAgent audits a versioned regulation, or None.
+    """
+    return _load_auditor_section(path, "regulation_diff")
+
+
+def summarize_risks(risks: List[Risk]) -> Dict[str, Any]:
+    """
+    Severity summary (counts, highest level, per category) of the risks as
+    reported, i.e. after the fan-out to near-duplicate policies. The
+    auditor's own summary only counts the audited representatives.
+    """
+    return summarize_severities(
+        [r.policy_id for r in risks],
+        [r.severity for r in risks],
+        [r.similarity for r in risks],
+    )
+
+
+# -------------------------------------------------------------------
+# Step 1b – Fan risks out to near-duplicate policies
+# -------------------------------------------------------------------
+
+def load_policy_groups(path: Path = POLICY_GROUPS_PATH) -> Dict[str, List[str]]:
+    """
+    Loads the near-duplicate groups written by the AuditorAgent dedup stage.
+    Returns representative -> members, or {} if the file does not exist.
+    """
+    if not path.exists():
+        return {}
+
+    data = read_data(path)
+    groups: Dict[str, List[str]] = {}
+    for group in data.get("groups", []):
+        groups[str(group["representative"])] = [str(m) for m in group["members"]]
+
+    logger.info(f"Loaded {len(groups)} near-duplicate policy groups from: {path}")
+    return groups
+
+
+def fan_out_duplicates(risks: List[Risk], groups: Dict[str, List[str]]) -> List[Risk]:
+    """
+    Only one representative per group of near-duplicate policies is audited.
+    Copies each representative's risks (scores included) to the other
+    members of its group, with duplicate_of set to the representative policy_id.
+    """
+    if not groups:
+        return risks
+
+    fanned: List[Risk] = []
+    for r in risks:
+        fanned.append(r)
+        for member in groups.get(r.policy_id, []):
+            if member == r.policy_id:
+                continue
+            fanned.append(replace(r, policy_id=member, duplicate_of=r.policy_id))
+
+    logger.info(f"Fanned out {len(fanned) - len(risks)} risks to near-duplicate policies.")
+    return fanned
+
+
 # -------------------------------------------------------------------
 # Step 2 – Build regulation_id
 # -------------------------------------------------------------------
 
-def generate_regulation_id(risks: List[Risk]) -> str:
+def generate_regulation_id(risks: List[Risk], regulation_name: Optional[str] = None) -> str:
     """
     Generates a deterministic regulation_id based on the new_rule_excerpt(s).
-    If later you have the full text of the regulation, you can switch to hashing that instead.
+    When the regulation's name is known (auditor regulation store), the id is
+    a hash of the name instead, so every version of a regulation keeps the
+    same id.
     """
     h = hashlib.sha256()
 
-    if not risks:
+    if regulation_name:
+        h.update(f"REGULATION::{regulation_name}".encode("utf-8"))
+    elif not risks:
         # fallback: empty seed
         h.update(b"EMPTY_RISKS")
     else:
@@ -149,14 +266,21 @@ def generate_regulation_id(risks: List[Risk]) -> str:
 # Step 3 – Build global recommendation
 # -------------------------------------------------------------------
 
-def build_global_recommendation(risks: List[Risk]) -> str:
+def build_global_recommendation(
+    risks: List[Risk],
+    severity_summary: Optional[Dict[str, Any]] = None,
+) -> str:
     """
     Builds a global recommendation string based on the highest severity present.
+    Uses the precomputed highest_severity when severity_summary is given.
     """
     if not risks:
         return "No conflicts detected. No immediate action required."
 
-    severities = {r.severity.upper() for r in risks}
+    if severity_summary and severity_summary.get("highest_severity"):
+        severities = {severity_summary["highest_severity"]}
+    else:
+        severities = {r.severity.upper() for r in risks}
 
     if "HIGH" in severities:
         return (
@@ -177,7 +301,11 @@ def build_global_recommendation(risks: List[Risk]) -> str:
 # Step 4 – Build final ARCA JSON report
 # -------------------------------------------------------------------
 
-def build_final_report(risks: List[Risk]) -> Dict[str, Any]:
+def build_final_report(
+    risks: List[Risk],
+    regulation_diff: Optional[Dict[str, Any]] = None,
+    severity_summary: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
     """
     Builds the final ARCA JSON report from a list of Risk objects.
 
@@ -193,29 +321,47 @@ def build_final_report(risks: List[Risk]) -> Dict[str, Any]:
           "severity": "HIGH" | "MEDIUM" | "LOW",
           "divergence_summary": str,
           "conflicting_policy_excerpt": str,
-          "new_rule_excerpt": str
+          "new_rule_excerpt": str,
+          "similarity": float,         (when scored by the auditor)
+          "confidence": float,         (auditor threshold-margin score, a heuristic, not a probability)
+          "duplicate_of": str          (only for risks fanned out to a near-duplicate)
         },
         ...
       ],
-      "recommendation": str
+      "recommendation": str,
+      "severity_summary": {...},       (only when given; counts include fanned-out duplicates)
+      "changes": {                     (only when regulation_diff is given)
+        "regulation": str,             (name in the auditor regulation store; regulation_id is derived from it)
+        "from_version": int | null,
+        "to_version": int,
+        "clauses_added": [str], "clauses_removed": [str],
+        "risks_appeared": [...], "risks_disappeared": [...], "severity_changed": [...],
+        "risks_rescored": [...]        (scored by another embedding model than last time)
+      }
     }
     """
-    regulation_id = generate_regulation_id(risks)
+    regulation_name = regulation_diff.get("regulation") if regulation_diff is not None else None
+    regulation_id = generate_regulation_id(risks, regulation_name)
     today = date.today().isoformat()
     total_risks = len(risks)
-    recommendation = build_global_recommendation(risks)
+    recommendation = build_global_recommendation(risks, severity_summary)
 
     risks_output: List[Dict[str, Any]] = []
     for r in risks:
-        risks_output.append(
-            {
-                "policy_id": r.policy_id,
-                "severity": r.severity,
-                "divergence_summary": r.divergence_summary,
-                "conflicting_policy_excerpt": r.conflicting_policy_excerpt,
-                "new_rule_excerpt": r.new_rule_excerpt,
-            }
-        )
+        risk_output: Dict[str, Any] = {
+            "policy_id": r.policy_id,
+            "severity": r.severity,
+            "divergence_summary": r.divergence_summary,
+            "conflicting_policy_excerpt": r.conflicting_policy_excerpt,
+            "new_rule_excerpt": r.new_rule_excerpt,
+        }
+        if r.similarity is not None:
+            risk_output["similarity"] = r.similarity
+        if r.confidence is not None:
+            risk_output["confidence"] = r.confidence
+        if r.duplicate_of:
+            risk_output["duplicate_of"] = r.duplicate_of
+        risks_output.append(risk_output)
 
     report: Dict[str, Any] = {
         "regulation_id": regulation_id,
@@ -225,6 +371,27 @@ def build_final_report(risks: List[Risk]) -> Dict[str, Any]:
         "recommendation": recommendation,
     }
 
+    if severity_summary is not None:
+        report["severity_summary"] = severity_summary
+
+    if regulation_diff is not None:
+        report["changes"] = {
+            "regulation": regulation_name,
+            "from_version": regulation_diff.get("from_version"),
+            "to_version": regulation_diff.get("to_version"),
+        }
+        report["changes"].update(
+            (key, regulation_diff.get(key, []))
+            for key in (
+                "clauses_added",
+                "clauses_removed",
+                "risks_appeared",
+                "risks_disappeared",
+                "severity_changed",
+                "risks_rescored",
+            )
+        )
+
     return report
 
 
@@ -234,11 +401,10 @@ def build_final_report(risks: List[Risk]) -> Dict[str, Any]:
 
 def save_final_report(report: Dict[str, Any], path: Path = FINAL_REPORT_PATH) -> None:
     """
-    Saves the final JSON report to disk.
+    Saves the final JSON report to disk (atomically: the NotificationsAgent
+    never reads a half-written report).
     """
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8") as f:
-        json.dump(report, f, ensure_ascii=False, indent=2)
+    write_atomic(path, report)
     logger.info(f"Final report saved to: {path}")
 
 
@@ -246,26 +412,49 @@ def save_final_report(report: Dict[str, Any], path: Path = FINAL_REPORT_PATH) ->
 # Main entrypoint (when running `python generator_agent.py`)
 # -------------------------------------------------------------------
 
-def main() -> None:
+def main(policy_conflicts: bool = False, tenant: str = DEFAULT_TENANT) -> None:
     """
     Complete pipeline for Agent 3:
-    - Load auditor_output.json
+    - Load auditor_output.json (or policy_conflicts.json)
     - Validate and normalize risks
+    - Fan risks out to near-duplicate policies
+    - Recompute the severity summary of the fanned-out risks
     - Build final report
-    - Save final_report.json
+    - Save final_report.json (or policy_conflicts_report.json)
+    All paths are the tenant's (see tenant_io_paths).
     """
-    logger.info("=== ARCA Generator Agent starting ===")
-
-    risks = load_auditor_output(AUDITOR_OUTPUT_PATH)
+    logger.info(f"=== ARCA Generator Agent starting (tenant: {tenant}) ===")
+    paths = tenant_io_paths(tenant)
+
+    regulation_diff = None
+    severity_summary = None
+    if policy_conflicts:
+        # policy-policy pairs are computed on every policy, no fan-out needed
+        risks = load_auditor_output(paths["policy_conflicts"])
+        report_path = paths["policy_conflicts_report"]
+    else:
+        risks = load_auditor_output(paths["auditor_output"])
+        risks = fan_out_duplicates(risks, load_policy_groups(paths["policy_groups"]))
+        regulation_diff = load_regulation_diff(paths["auditor_output"])
+        severity_summary = summarize_risks(risks)
+        report_path = paths["final_report"]
 
     if not risks:
         logger.warning("No valid risks found in auditor output. Report will contain 0 risks.")
 
-    report = build_final_report(risks)
-    save_final_report(report, FINAL_REPORT_PATH)
+    report = build_final_report(risks, regulation_diff, severity_summary)
+    save_final_report(report, report_path)
 
     logger.info("=== ARCA Generator Agent completed successfully ===")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--policy-conflicts",
+        action="store_true",
+        help="Report the policy-policy conflicts instead of the regulation audit",
+    )
+    parser.add_argument("--tenant", default=DEFAULT_TENANT, help="Tenant id (folder under tenants/)")
+    args = parser.parse_args()
+    main(policy_conflicts=args.policy_conflicts, tenant=args.tenant)
@@ -0,0 +1,7 @@
+"""
+Code shared by every ARCA agent (AuditorAgent, GeneratorAgent,
+ARCA_NotificationsAgent, ARCA_Scheduler).
+
+The agents are run as scripts from their own folder, so each one adds the
+project root to sys.path before importing arca_common.
+"""
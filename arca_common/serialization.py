@@ -0,0 +1,168 @@
+"""
+Serialization layer shared by the ARCA agents
+
+- JSON files (the hand-off between agents: auditor_output.json,
+  final_report.json, ...) are written with orjson when it is installed and
+  with the stdlib json module otherwise; both produce the same UTF-8 JSON
+- Internal files that no other tool reads (regulation records, batch
+  checkpoints) use the format set by ARCA_INTERNAL_FORMAT ("json" by
+  default, or "msgpack"). It is a deployment setting, not a guess based on
+  what this process can import: every host reading those files must use the
+  same value (and have msgpack installed for "msgpack")
+- The format of a file is given by its suffix (".msgpack" or ".json")
+- Output is compact; pretty-printing is optional (pretty=True, or
+  ARCA_PRETTY_JSON=1 for every file)
+- Every write goes to a temp file in the same folder, is flushed to disk
+  (fsync), then renamed over the target: a reader never sees a partial file
+  and a finished write survives a crash
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Optional
+
+try:
+    import orjson
+except ImportError:  # stdlib fallback
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # only needed with ARCA_INTERNAL_FORMAT=msgpack
+    msgpack = None
+
+
+# -------------------------------------------------------------------
+# Config
+# -------------------------------------------------------------------
+
+JSON_SUFFIX = ".json"
+MSGPACK_SUFFIX = ".msgpack"
+
+INTERNAL_FORMAT = os.environ.get("ARCA_INTERNAL_FORMAT", "json")
+if INTERNAL_FORMAT not in ("json", "msgpack"):
+    raise ValueError(f"ARCA_INTERNAL_FORMAT must be 'json' or 'msgpack', not {INTERNAL_FORMAT!r}")
+
+# Suffix of internal (agent-private) files
+INTERNAL_SUFFIX = MSGPACK_SUFFIX if INTERNAL_FORMAT == "msgpack" else JSON_SUFFIX
+
+PRETTY_DEFAULT = os.environ.get("ARCA_PRETTY_JSON", "") == "1"
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj: Any) -> Any:
+    # numpy scalars / arrays reach the stdlib and msgpack encoders as-is
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+# -------------------------------------------------------------------
+# Bytes
+# -------------------------------------------------------------------
+
+def dumps_json(data: Any, pretty: bool = PRETTY_DEFAULT) -> bytes:
+    if orjson is not None:
+        options = _ORJSON_OPTIONS | (orjson.OPT_INDENT_2 if pretty else 0)
+        return orjson.dumps(data, default=_default, option=options)
+    if pretty:
+        text = json.dumps(data, ensure_ascii=False, indent=2, default=_default)
+    else:
+        text = json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=_default)
+    return text.encode("utf-8")
+
+
+def loads_json(raw: bytes) -> Any:
+    if raw.startswith(b"\xef\xbb\xbf"):  # files saved by Windows editors
+        raw = raw[3:]
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw.decode("utf-8"))
+
+
+def _require_msgpack() -> None:
+    if msgpack is None:
+        raise RuntimeError(
+            "This file is MessagePack but msgpack is not installed (pip install msgpack). "
+            "Every host sharing ARCA_INTERNAL_FORMAT=msgpack files needs it."
+        )
+
+
+def dumps(data: Any, fmt: str = "json", pretty: bool = PRETTY_DEFAULT) -> bytes:
+    """
+    Encodes data as "json" or "msgpack" bytes.
+    """
+    if fmt == "msgpack":
+        _require_msgpack()
+        return msgpack.packb(data, use_bin_type=True, default=_default)
+    return dumps_json(data, pretty=pretty)
+
+
+def loads(raw: bytes, fmt: str = "json") -> Any:
+    if fmt == "msgpack":
+        _require_msgpack()
+        return msgpack.unpackb(raw, raw=False, strict_map_key=False)
+    return loads_json(raw)
+
+
+def format_for(path: Path) -> str:
+    return "msgpack" if path.suffix == MSGPACK_SUFFIX else "json"
+
+
+# -------------------------------------------------------------------
+# Files
+# -------------------------------------------------------------------
+
+def write_atomic(path: Path, data: Any, pretty: bool = PRETTY_DEFAULT) -> None:
+    """
+    Serializes data in the format of path's suffix, writes it to a temp file
+    in the same folder, fsyncs it, then renames it over path.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = dumps(data, format_for(path), pretty=pretty)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with tmp.open("wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        _fsync_dir(path.parent)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def _fsync_dir(directory: Path) -> None:
+    # makes the rename itself durable; folders cannot be opened on Windows
+    if os.name != "posix":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def newest_existing(*paths: Path) -> Optional[Path]:
+    """
+    Returns the most recently written of paths that exist (e.g. the same
+    record saved as .json and .msgpack), or None.
+    """
+    existing = [Path(p) for p in paths if Path(p).exists()]
+    return max(existing, key=lambda p: p.stat().st_mtime_ns) if existing else None
+
+
+def read_data(path: Path) -> Any:
+    """
+    Reads a file written by write_atomic (or any JSON file).
+    """
+    path = Path(path)
+    return loads(path.read_bytes(), format_for(path))
@@ -0,0 +1,56 @@
+"""
+Severity summary shared by the ARCA agents
+
+The AuditorAgent writes a "severity_summary" next to its results; the
+GeneratorAgent recomputes it after copying risks to near-duplicate policies,
+so the counts of the final report add up to its total_risks_flagged.
+"""
+
+from __future__ import annotations
+
+import re
+from collections import Counter
+from typing import Any, Dict, Optional, Sequence
+
+
+SEVERITY_ORDER = ("LOW", "MEDIUM", "HIGH")
+
+_CATEGORY_RE = re.compile(r"(?:_\d+)?(?:\.\w+)?$")
+
+
+def policy_category(policy_id: str) -> str:
+    """
+    "mining_safety_78.txt" -> "mining_safety"
+    """
+    return _CATEGORY_RE.sub("", policy_id)
+
+
+def summarize_severities(
+    policy_ids: Sequence[str],
+    severities: Sequence[str],
+    scores: Sequence[Optional[float]],
+) -> Dict[str, Any]:
+    """
+    Severity counts, highest level, max score and highest level per policy
+    category of a list of risks (aligned sequences). Unknown severities are
+    counted nowhere; missing scores are ignored by max_score.
+    """
+    rank = {level: i for i, level in enumerate(SEVERITY_ORDER)}
+    counts = Counter(severities)
+    known = [s for s in severities if s in rank]
+    known_scores = [s for s in scores if s is not None]
+
+    by_category: Dict[str, str] = {}
+    for policy_id, severity in zip(policy_ids, severities):
+        if severity not in rank:
+            continue
+        category = policy_category(policy_id)
+        if category not in by_category or rank[severity] > rank[by_category[category]]:
+            by_category[category] = severity
+
+    return {
+        "counts": {level: counts.get(level, 0) for level in reversed(SEVERITY_ORDER)},
+        "highest_severity": max(known, key=rank.__getitem__) if known else None,
+        "max_score": round(float(max(known_scores)), 4) if known_scores else None,
+        "by_category": dict(sorted(by_category.items())),
+    }
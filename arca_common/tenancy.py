@@ -0,0 +1,129 @@
+"""
+Tenant ids and per-tenant paths shared by the ARCA agents
+
+    tenants/<tenant_id>/
+        policies/*.txt
+        user_preferences.json
+        outputs/                      (auditor, generator and notifications outputs)
+
+The "default" tenant is the original single-tenant layout (policies/ at the
+project root, outputs next to each agent).
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List
+
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+TENANTS_DIR = PROJECT_ROOT / "tenants"
+
+DEFAULT_TENANT = "default"
+
+# ASCII only, so an id can never escape tenants/ or differ by Unicode lookalikes
+_TENANT_ID_RE = re.compile(r"[A-Za-z0-9_-]+")
+
+
+def validate_tenant_id(tenant_id: str) -> str:
+    """
+    Returns tenant_id, or raises ValueError if it is not made of ASCII
+    letters, digits, "_" and "-".
+    """
+    if not isinstance(tenant_id, str) or not _TENANT_ID_RE.fullmatch(tenant_id):
+        raise ValueError(f"Invalid tenant id: {tenant_id!r}")
+    return tenant_id
+
+
+@dataclass(frozen=True)
+class TenantPaths:
+    tenant_id: str
+    policies_dir: Path
+    user_preferences: Path
+    researcher_output: Path
+    auditor_outputs_dir: Path
+    generator_outputs_dir: Path
+    notifications_outputs_dir: Path
+
+    # AuditorAgent
+    @property
+    def auditor_output(self) -> Path:
+        return self.auditor_outputs_dir / "auditor_output.json"
+
+    @property
+    def policy_groups(self) -> Path:
+        return self.auditor_outputs_dir / "policy_groups.json"
+
+    @property
+    def policy_conflicts(self) -> Path:
+        return self.auditor_outputs_dir / "policy_conflicts.json"
+
+    @property
+    def embeddings_dir(self) -> Path:
+        # embedding shards written by ingestion, reused when indexes are built
+        return self.auditor_outputs_dir / "embeddings"
+
+    # GeneratorAgent
+    @property
+    def final_report(self) -> Path:
+        return self.generator_outputs_dir / "final_report.json"
+
+    @property
+    def policy_conflicts_report(self) -> Path:
+        return self.generator_outputs_dir / "policy_conflicts_report.json"
+
+    # NotificationsAgent
+    @property
+    def newsletters_dir(self) -> Path:
+        return self.notifications_outputs_dir / "newsletters"
+
+    @property
+    def notification_logs_dir(self) -> Path:
+        return self.notifications_outputs_dir / "logs"
+
+    @property
+    def notifications_state(self) -> Path:
+        return self.notifications_outputs_dir / "last_state.json"
+
+
+def tenant_paths(tenant_id: str = DEFAULT_TENANT) -> TenantPaths:
+    """
+    Returns the folders and files of a tenant (see the module docstring).
+    """
+    if tenant_id == DEFAULT_TENANT:
+        return TenantPaths(
+            tenant_id=tenant_id,
+            policies_dir=PROJECT_ROOT / "policies",
+            user_preferences=PROJECT_ROOT / "ARCA_NotificationsAgent" / "user_preferences.json",
+            researcher_output=PROJECT_ROOT / "outputs" / "researcher_output_chroma.json",
+            auditor_outputs_dir=PROJECT_ROOT / "AuditorAgent" / "outputs",
+            generator_outputs_dir=PROJECT_ROOT / "GeneratorAgent" / "outputs",
+            notifications_outputs_dir=PROJECT_ROOT / "ARCA_NotificationsAgent" / "outputs",
+        )
+
+    root = TENANTS_DIR / validate_tenant_id(tenant_id)
+    outputs = root / "outputs"
+    return TenantPaths(
+        tenant_id=tenant_id,
+        policies_dir=root / "policies",
+        user_preferences=root / "user_preferences.json",
+        researcher_output=outputs / "researcher_output_chroma.json",
+        auditor_outputs_dir=outputs,
+        generator_outputs_dir=outputs,
+        notifications_outputs_dir=outputs / "notifications",
+    )
+
+
+def list_tenants() -> List[str]:
+    """
+    The default tenant, then every valid tenant folder under tenants/.
+    """
+    tenants = [DEFAULT_TENANT]
+    if TENANTS_DIR.exists():
+        tenants.extend(sorted(
+            p.name for p in TENANTS_DIR.iterdir()
+            if p.is_dir() and _TENANT_ID_RE.fullmatch(p.name) and p.name != DEFAULT_TENANT
+        ))
+    return tenants